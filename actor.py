@@ -11,10 +11,137 @@ different types of elements in the game.
 """
 
 import pygame
-from typing import Tuple, Optional
+from typing import Tuple, Optional, Dict, List
 from settings import *
 
 
+class Properties:
+    """
+    The properties given by the rules to the actors of one type in one game,
+    e.g. whether Walls can be pushed. Every Character reads its properties
+    from the Properties of its type in its game, so a rule changes them for
+    all the characters of that type at once.
+
+    === Public Attributes ===
+    stop:
+        Whether these actors cannot be moved through
+    push:
+        Whether these actors can be pushed
+    player:
+        Whether these actors are the player, i.e., "<Character> isYou"
+    lose:
+        Whether touching these actors loses the game
+    win:
+        Whether touching these actors wins the game
+    """
+    __slots__ = ("stop", "push", "player", "lose", "win")
+    stop: bool
+    push: bool
+    player: bool
+    lose: bool
+    win: bool
+
+    def __init__(self, stop: bool = False, push: bool = False) -> None:
+        """
+        Initialize the properties of actors that no rule applies to.
+        """
+        self.stop = stop
+        self.push = push
+        self.player = False
+        self.lose = False
+        self.win = False
+
+    def get_state(self) -> Tuple[bool, bool, bool, bool, bool]:
+        """
+        Return these properties in a form that can be given back to
+        set_state.
+        """
+        return self.stop, self.push, self.player, self.lose, self.win
+
+    def set_state(self, state: Tuple[bool, bool, bool, bool, bool]) -> None:
+        """
+        Restore these properties to <state>, as returned by get_state.
+        """
+        self.stop, self.push, self.player, self.lose, self.win = state
+
+    def get_flags(self) -> int:
+        """
+        Return these properties as bits.
+
+        >>> Properties(stop=True, push=True).get_flags()
+        3
+        """
+        return self.stop + 2 * self.push + 4 * self.win + 8 * self.lose \
+            + 16 * self.player
+
+    def set_flags(self, flags: int) -> None:
+        """
+        Set these properties from <flags>, as returned by get_flags.
+
+        >>> properties = Properties()
+        >>> properties.set_flags(3)
+        >>> properties.stop, properties.push, properties.win
+        (True, True, False)
+        """
+        self.stop = bool(flags & 1)
+        self.push = bool(flags & 2)
+        self.win = bool(flags & 4)
+        self.lose = bool(flags & 8)
+        self.player = bool(flags & 16)
+
+    def copy(self) -> 'Properties':
+        """
+        Return a copy of these properties.
+        """
+        other = Properties()
+        other.set_state(self.get_state())
+        return other
+
+    def set_player(self) -> None:
+        """
+        Make these actors the player, which can neither stop nor be pushed.
+        """
+        self.player = True
+        self.stop = False
+        self.push = False
+
+    def set_stop(self) -> None:
+        """
+        Make these actors incapable of being moved through or pushed.
+        """
+        self.stop = True
+        self.push = False
+        self.player = False
+
+    def set_push(self) -> None:
+        """
+        Make these actors pushable.
+        """
+        self.push = True
+        self.stop = False
+        self.player = False
+
+    def set_win(self) -> None:
+        """
+        Make these actors the win condition.
+        """
+        self.win = True
+        self.lose = False
+
+    def set_lose(self) -> None:
+        """
+        Make these actors the lose condition.
+        """
+        self.lose = True
+        self.win = False
+
+
+# The properties of actors that rules never change
+NO_PROPERTIES = Properties()
+BUSH_PROPERTIES = Properties(stop=True)
+BLOCK_PROPERTIES = Properties(stop=True, push=True)
+
+
 class Actor:
     """
     A class that represents all the actors in the game. This class includes any
@@ -25,41 +152,123 @@ class Actor:
         x coordinate of this actor's location on the stage
     y:
         y coordinate of this actor's location on the stage
+    sprite:
+        the image file of the actor, and whether the image is mirrored
+        left-to-right
     image:
-        the image of the actor
+        the image of the actor (read-only), loaded from the image cache the
+        first time it is needed, so that actors that are never drawn never
+        load an image
 
     === Private Attributes ===
-    _is_stop:
-        Flag to keep track of whether this object cannot be moved through
-    _is_push:
-        Flag to keep track of whether this object is pushable
+    _x, _y, _sprite:
+        Storage for x, y and sprite
+    _game:
+        The Game this actor is placed in, which is told whenever the actor
+        changes position or sprite so it can keep its index of actors and
+        the screen up to date. None if the actor is not in a game.
+    _properties:
+        Whether this object cannot be moved through, is pushable, etc.
+        Shared with the other actors of its type.
 
     Representation Invariant: x,y must be greater or equal to 0
     """
-    x: int
-    y: int
-    _is_stop: bool
-    _is_push: bool
-    image: pygame.Surface
+    # Actors have no __dict__, since big maps have tens of thousands of them.
+    __slots__ = ("_x", "_y", "_sprite", "_game")
+    _x: int
+    _y: int
+    _sprite: Optional[Tuple[str, bool]]
+    _game: Optional['Game']
+    _properties: Properties = NO_PROPERTIES
 
     def __init__(self, x: int, y: int) -> None:
 
-        self.x, self.y = x, y
-        self._is_stop = False
-        self._is_push = False
-        self.image = pygame.Surface((TILESIZE, TILESIZE))
+        self._game = None
+        self._x, self._y = x, y
+        self._sprite = None
+
+    @property
+    def x(self) -> int:
+        """
+        x coordinate of this actor's location on the stage
+        """
+        return self._x
+
+    @x.setter
+    def x(self, value: int) -> None:
+        old_x = self._x
+        self._x = value
+        if self._game is not None and value != old_x:
+            self._game.actor_moved(self, old_x, self._y)
+
+    @property
+    def y(self) -> int:
+        """
+        y coordinate of this actor's location on the stage
+        """
+        return self._y
+
+    @y.setter
+    def y(self, value: int) -> None:
+        old_y = self._y
+        self._y = value
+        if self._game is not None and value != old_y:
+            self._game.actor_moved(self, self._x, old_y)
+
+    @property
+    def sprite(self) -> Optional[Tuple[str, bool]]:
+        """
+        the image file of the actor, and whether the image is mirrored
+        """
+        return self._sprite
+
+    @sprite.setter
+    def sprite(self, value: Optional[Tuple[str, bool]]) -> None:
+        changed = value != self._sprite
+        self._sprite = value
+        if self._game is not None and changed:
+            self._game.actor_restyled(self)
+
+    @property
+    def image(self) -> Optional[pygame.Surface]:
+        """
+        the image of the actor
+        """
+        if self.sprite is None:
+            return None
+        img_name, flipped = self.sprite
+        return load_image(img_name, flipped=flipped)
+
+    def set_game(self, game_: Optional['Game']) -> None:
+        """
+        Place this actor in <game_>, or take it out of its game if None.
+        """
+        self._game = game_
 
     def is_stop(self) -> bool:
         """
-        Getter for _is_stop
+        Getter for whether this object cannot be moved through
         """
-        return self._is_stop
+        return self._properties.stop
 
     def is_push(self) -> bool:
         """
-        Getter for _is_push
+        Getter for whether this object is pushable
+        """
+        return self._properties.push
+
+    def get_state(self) -> tuple:
+        """
+        Return everything about this actor except its position and its
+        properties, in a form that can be given back to set_state.
         """
-        return self._is_push
+        return (self.sprite,)
+
+    def set_state(self, state: tuple) -> None:
+        """
+        Restore this actor to <state>, as returned by get_state.
+        """
+        self.sprite, = state
 
     def copy(self) -> 'Actor':
         """
@@ -91,25 +300,44 @@ class Actor:
           in which case this method should return False
         - Recall how push works: you may push and move a line of multiple
           objects as long as the move is not blocked by something.
-        """
-        destination_x = self.x + dx
-        destination_y = self.y + dy
-        exist_ac = game_.get_actor(destination_x, destination_y)
-
-        if exist_ac and exist_ac.is_push():
-            if exist_ac.move(game_, dx, dy):
-                self.x += dx
-                self.y += dy
-                return True
-            return False
 
-        if exist_ac and exist_ac.is_stop():
+        The whole line that would move is found first (see push_line). If
+        it is blocked, nothing moves; otherwise the line moves, the actor
+        furthest ahead first. A line of any length is pushed without
+        recursion.
+        """
+        line = self.push_line(game_, dx, dy)
+        if line is None:
             return False
 
-        self.x += dx
-        self.y += dy
+        for ac in reversed(line):
+            ac.x += dx
+            ac.y += dy
         return True
 
+    def push_line(self, game_: 'Game', dx: int,
+                  dy: int) -> Optional[List['Actor']]:
+        """
+        Return the actors that would move if <self> moved by (dx, dy): <self>
+        followed by the line of actors it would push, or None if the move
+        is blocked. Nothing is changed.
+
+        The cells in the direction of the move are looked at once, up to the
+        first one that does not hold a pushable actor; the move is blocked
+        if that cell holds an actor that stops it.
+        """
+        line = [self]
+        x, y = self.x + dx, self.y + dy
+        exist_ac = game_.get_actor(x, y)
+        while exist_ac and exist_ac.is_push():
+            line.append(exist_ac)
+            x, y = x + dx, y + dy
+            exist_ac = game_.get_actor(x, y)
+
+        if exist_ac and exist_ac.is_stop():
+            return None
+        return line
+
 
 class Character(Actor):
     """
@@ -119,124 +347,120 @@ class Character(Actor):
     A Character could potentially be the player that is controlled by the
     key presses
 
-    === Additional Private Attributes ===
-    _is_player:
-        Whether the character is the player, i.e., "<Character> isYou"
-    _is_lose:
-        Whether the rules contains "<Character> isLose"
-    _is_win:
-        Whether the rules contains "<Character> isWin"
+    Its properties are those of its type in the game it is placed in (see
+    Game.get_properties), so setting one sets it for all the characters of
+    its type there. A character not in a game has properties of its own.
     """
-    _is_player: bool
-    _is_lose: bool
-    _is_win: bool
+    __slots__ = ("_properties",)
 
     def __init__(self, x: int, y: int) -> None:
         """
         Initializes the Character
         """
         super().__init__(x, y)
-        self._is_player = False
-        self._is_lose = False
-        self._is_win = False
+        self._properties = Properties()
+
+    def set_game(self, game_: Optional['Game']) -> None:
+        """
+        Place this character in <game_>, sharing the properties of its type
+        there, or take it out of its game if None.
+        """
+        super().set_game(game_)
+        if game_ is not None:
+            self._properties = game_.get_properties(type(self))
 
     def is_win(self) -> bool:
         """
-        Getter for _is_win
+        Getter for whether touching this character wins the game
         """
-        return self._is_win
+        return self._properties.win
 
     def is_lose(self) -> bool:
         """
-        Getter for _is_lose
+        Getter for whether touching this character loses the game
         """
-        return self._is_lose
+        return self._properties.lose
 
     def is_player(self) -> bool:
         """
-        Getter for _is_player
+        Getter for whether this character is the player
         """
-        return self._is_player
+        return self._properties.player
 
     def set_player(self) -> None:
         """
         Sets flag to make this actor the player.
         """
-        self._is_player = True
-        self._is_stop = False
-        self._is_push = False
+        self._properties.set_player()
 
     def unset_player(self) -> None:
         """
         Unsets the flag to make the actor not the player.
         """
-        self._is_player = False
+        self._properties.player = False
 
     def set_stop(self) -> None:
         """
         Sets flag to make actor incapable of being moved through or pushed.
         """
-        self._is_stop = True
-        self._is_push = False
-        self._is_player = False
+        self._properties.set_stop()
 
     def unset_stop(self) -> None:
         """
         Unsets the flag that prevents actor from being moved through or pushed.
         """
-        self._is_stop = False
+        self._properties.stop = False
 
     def set_push(self) -> None:
         """
         Sets the flag that allows the actor to be pushable
         """
-        self._is_push = True
-        self._is_stop = False
-        self._is_player = False
+        self._properties.set_push()
 
     def unset_push(self) -> None:
         """
         Unsets the flag that allows the actor to be pushable
         """
-        self._is_push = False
+        self._properties.push = False
 
     def set_win(self) -> None:
         """
         Sets this actor to be the win Condition.
         """
-        self._is_win = True
-        self._is_lose = False
+        self._properties.set_win()
 
     def unset_win(self) -> None:
         """
         Unsets this actor from being the win Condition.
         """
-        self._is_win = False
+        self._properties.win = False
 
     def set_lose(self) -> None:
         """
         Sets this flag to be the lose condition.
         """
-        self._is_lose = True
-        self._is_win = False
+        self._properties.set_lose()
 
     def unset_lose(self) -> None:
         """
         Unsets this flag from being the lose condition.
         """
-        self._is_lose = False
+        self._properties.lose = False
+
+    def get_properties(self) -> Properties:
+        """
+        Return the properties this character reads.
+        """
+        return self._properties
 
     def copy_flags(self, other: "Character") -> None:
         """
-        Copy the boolean flags to the <other> object
+        Give the <other> object the flags of this one, by sharing them until
+        <other> is placed in a game.
         This is a helper method that should be used by the copy methods
         implemented in the subclasses.
         """
-        other._is_player = self._is_player
-        other._is_push = self._is_push
-        other._is_stop = self._is_stop
-        other._is_lose = self._is_lose
-        other._is_win = self._is_win
+        other._properties = self._properties
 
     def copy(self) -> 'Character':
         """
@@ -262,6 +486,13 @@ class Character(Actor):
             dy += 1
         return dx, dy
 
+    def turn(self, dx: int, dy: int) -> None:
+        """
+        Face the direction (dx, dy) the player is about to move in.
+        Characters that look the same in every direction do nothing.
+        """
+        pass
+
     def player_move(self, game_: 'Game') -> bool:
         """
         Detects input from the keyboard and moves the Player on the game stage
@@ -271,6 +502,16 @@ class Character(Actor):
         and call the win() and lose() methods in Game accordingly
         """
         dx, dy = self.handle_key_press(game_)
+        return self.player_move_by(game_, dx, dy)
+
+    def player_move_by(self, game_: 'Game', dx: int, dy: int) -> bool:
+        """
+        Moves the Player on the game stage by (dx, dy), the same way as
+        player_move does when the matching directional key is pressed.
+
+        Returns whether the Player actually moves.
+        """
+        self.turn(dx, dy)
         if dx == 0 and dy == 0:
             return False
         return self.move(game_, dx, dy)
@@ -286,38 +527,29 @@ class Meepo(Character):
 
     === Additional Public Attributes ===
     walk_right:
-        Image for walking right
+        Sprites for walking right
     walk_left:
-        Image for walking left
+        Sprites for walking left
     walk_up:
-        Image for walking up
+        Sprites for walking up
     walk_down:
-        Image for walking down
+        Sprites for walking down
+
+    The sprites are the same for every Meepo, so they belong to the class.
     """
-    walk_left: list
-    walk_right: list
-    walk_down: list
-    walk_up: list
+    __slots__ = ()
+    walk_right = ((PLAYER_SPRITE_R1, False), (PLAYER_SPRITE_R2, False))
+    walk_left = ((PLAYER_SPRITE_R1, True), (PLAYER_SPRITE_R2, True))
+    walk_up = ((PLAYER_SPRITE_U1, False), (PLAYER_SPRITE_U2, False))
+    walk_down = ((PLAYER_SPRITE_B1, False), (PLAYER_SPRITE_B2, False))
 
     def __init__(self, x: int, y: int) -> None:
         """
         Initializes the Meepo Class
-        Load the images for displaying Ms. Meepo's movement.
+        Set up the sprites for displaying Ms. Meepo's movement.
         """
         super().__init__(x, y)
-
-        # Add motion images
-        self.walk_right = [load_image(PLAYER_SPRITE_R1),
-                           load_image(PLAYER_SPRITE_R2)]
-        self.walk_left = [
-            pygame.transform.flip(load_image(PLAYER_SPRITE_R1), True, False),
-            pygame.transform.flip(load_image(PLAYER_SPRITE_R2), True, False)
-        ]
-        self.walk_up = [load_image(PLAYER_SPRITE_U1),
-                        load_image(PLAYER_SPRITE_U2)]
-        self.walk_down = [load_image(PLAYER_SPRITE_B1),
-                          load_image(PLAYER_SPRITE_B2)]
-        self.image = self.walk_down[1]
+        self.sprite = self.walk_down[1]
 
     def copy(self) -> 'Character':
         """
@@ -326,51 +558,45 @@ class Meepo(Character):
         """
         new_obj = Meepo(self.x, self.y)
         self.copy_flags(new_obj)
-        new_obj.image = self.image
-        new_obj.walk_down = self.walk_down
-        new_obj.walk_up = self.walk_up
-        new_obj.walk_right = self.walk_right
-        new_obj.walk_left = self.walk_left
+        new_obj.sprite = self.sprite
         return new_obj
 
-    def handle_key_press(self, game_: 'Game') -> Tuple[int, int]:
+    def turn(self, dx: int, dy: int) -> None:
         """
         Overriding the same method in the base class, adding the modification
         of the image depending on the direction of the move.
         """
-        dx, dy = super().handle_key_press(game_)
         if dx == 1:
-            if self.image != self.walk_right[0]:
-                self.image = self.walk_right[0]
+            if self.sprite != self.walk_right[0]:
+                self.sprite = self.walk_right[0]
             else:
-                self.image = self.walk_right[1]
+                self.sprite = self.walk_right[1]
         elif dx == -1:
-            if self.image != self.walk_left[0]:
-                self.image = self.walk_left[0]
+            if self.sprite != self.walk_left[0]:
+                self.sprite = self.walk_left[0]
             else:
-                self.image = self.walk_left[1]
+                self.sprite = self.walk_left[1]
         elif dy == 1:
-            if self.image != self.walk_down[0]:
-                self.image = self.walk_down[0]
+            if self.sprite != self.walk_down[0]:
+                self.sprite = self.walk_down[0]
             else:
-                self.image = self.walk_down[1]
+                self.sprite = self.walk_down[1]
         elif dy == -1:
-            if self.image != self.walk_up[0]:
-                self.image = self.walk_up[0]
+            if self.sprite != self.walk_up[0]:
+                self.sprite = self.walk_up[0]
             else:
-                self.image = self.walk_up[1]
-
-        return dx, dy
+                self.sprite = self.walk_up[1]
 
 
 class Wall(Character):
     """
     Class representing Wall in the game.
     """
+    __slots__ = ()
 
     def __init__(self, x: int, y: int):
         Character.__init__(self, x, y)
-        self.image = load_image(WALL_SPRITE)
+        self.sprite = (WALL_SPRITE, False)
 
     def copy(self) -> 'Wall':
         """
@@ -378,7 +604,7 @@ class Wall(Character):
         """
         new_obj = Wall(self.x, self.y)
         self.copy_flags(new_obj)
-        new_obj.image = self.image
+        new_obj.sprite = self.sprite
         return new_obj
 
 
@@ -386,10 +612,11 @@ class Rock(Character):
     """
     Class representing Rock in the game.
     """
+    __slots__ = ()
 
     def __init__(self, x: int, y: int):
         Character.__init__(self, x, y)
-        self.image = load_image(ROCK_SPRITE)
+        self.sprite = (ROCK_SPRITE, False)
 
     def copy(self) -> 'Rock':
         """
@@ -397,7 +624,7 @@ class Rock(Character):
         """
         new_obj = Rock(self.x, self.y)
         self.copy_flags(new_obj)
-        new_obj.image = self.image
+        new_obj.sprite = self.sprite
         return new_obj
 
 
@@ -405,10 +632,11 @@ class Flag(Character):
     """
     Class representing Flag in the game.
     """
+    __slots__ = ()
 
     def __init__(self, x: int, y: int):
         Character.__init__(self, x, y)
-        self.image = load_image(FLAG_SPRITE)
+        self.sprite = (FLAG_SPRITE, False)
 
     def copy(self) -> 'Flag':
         """
@@ -416,7 +644,7 @@ class Flag(Character):
         """
         new_obj = Flag(self.x, self.y)
         self.copy_flags(new_obj)
-        new_obj.image = self.image
+        new_obj.sprite = self.sprite
         return new_obj
 
 
@@ -424,14 +652,13 @@ class Bush(Actor):
     """
     Class representing the edges and unmovable objects in the game.
     """
+    __slots__ = ()
+    # Bush is always unmovable and cannot be moved through
+    _properties = BUSH_PROPERTIES
 
     def __init__(self, x: int, y: int) -> None:
         super().__init__(x, y)
-        self.image = load_image(BUSH_SPRITE)
-
-        # Bush is always unmovable and cannot be moved through
-        self._is_stop = True
-        self._is_push = False
+        self.sprite = (BUSH_SPRITE, False)
 
     def copy(self) -> 'Bush':
         """
@@ -451,14 +678,14 @@ class Block(Actor):
     Additional public attribute:
     word: the word on this block
     """
+    __slots__ = ("word",)
     word: str
+    # Blocks are always pushable and cannot be moved through.
+    _properties = BLOCK_PROPERTIES
 
     def __init__(self, x: int, y: int, word_: str) -> None:
         super().__init__(x, y)
         self.word = word_
-        # Blocks are always pushable and cannot be moved through.
-        self._is_push = True
-        self._is_stop = True
 
     def copy(self) -> 'Block':
         """
@@ -473,20 +700,19 @@ class Subject(Block):
     Class representing the Subject blocks in the game, e.g.,
     "Meepo", "Wall", "Flag", "Rock" (see SUBJECTS in settings.py)
     """
+    __slots__ = ()
 
     def __init__(self, x: int, y: int, word_: str) -> None:
         super().__init__(x, y, word_)
-        self.image = load_image(WORDS_SPRITES[word_.lower()])
+        self.sprite = (WORDS_SPRITES[word_.lower()], False)
 
     def copy(self) -> 'Subject':
         """
         Returns a copy of the Subject object
         """
         new_obj = Subject(self.x, self.y, self.word)
-        new_obj.image = self.image
+        new_obj.sprite = self.sprite
         new_obj.word = self.word
-        new_obj._is_stop = self.is_stop()
-        new_obj._is_push = self.is_push()
         return new_obj
 
 
@@ -495,20 +721,19 @@ class Attribute(Block):
     Class representing the Attribute blocks in the game, e.g.,
     "Push", "Stop", "Victory", "Lose", "You"
     """
+    __slots__ = ()
 
     def __init__(self, x: int, y: int, word_: str) -> None:
         super().__init__(x, y, word_)
-        self.image = load_image(WORDS_SPRITES[word_.lower()])
+        self.sprite = (WORDS_SPRITES[word_.lower()], False)
 
     def copy(self) -> 'Attribute':
         """
         Returns a copy of the Attribute object
         """
         new_obj = Attribute(self.x, self.y, self.word)
-        new_obj.image = self.image
+        new_obj.sprite = self.sprite
         new_obj.word = self.word
-        new_obj._is_stop = self.is_stop()
-        new_obj._is_push = self.is_push()
         return new_obj
 
 
@@ -516,21 +741,20 @@ class Is(Block):
     """
     Class representing the Is blocks in the game.
     """
+    __slots__ = ()
 
     def __init__(self, x: int, y: int) -> None:
 
         super().__init__(x, y, " is")  # Note the space in " is"
-        self.image = load_image(IS_PURPLE)
+        self.sprite = (IS_PURPLE, False)
 
     def copy(self) -> 'Is':
         """
         Returns a copy of the Is object
         """
         new_obj = Is(self.x, self.y)
-        new_obj.image = self.image
+        new_obj.sprite = self.sprite
         new_obj.word = self.word
-        new_obj._is_stop = self.is_stop()
-        new_obj._is_push = self.is_push()
         return new_obj
 
     def update(self, up: Optional[Actor],
@@ -572,23 +796,53 @@ class Is(Block):
             horizontal = "{}{}{}".format(left.word, self.word, right.word)
 
         if [horizontal, vertical].count("") == 2:
-            self.image = load_image(IS_PURPLE)
+            self.sprite = (IS_PURPLE, False)
         elif [horizontal, vertical].count("") == 1:
-            self.image = load_image(IS_LIGHT_BLUE)
+            self.sprite = (IS_LIGHT_BLUE, False)
         elif [horizontal, vertical].count("") == 0:
-            self.image = load_image(IS_DARK_BLUE)
+            self.sprite = (IS_DARK_BLUE, False)
 
         return horizontal, vertical
 
 
+# Decoded and scaled images, keyed by (img_name, width, height, flipped).
+# Every actor (and every copy of an actor) shares the images in here, so each
+# PNG is read from disk and scaled only once.
+_IMAGE_CACHE: Dict[Tuple[str, int, int, bool], pygame.Surface] = {}
+
+
 def load_image(img_name: str, width: int = TILESIZE,
-               height: int = TILESIZE) -> pygame.image:
+               height: int = TILESIZE, flipped: bool = False) -> pygame.image:
     """
     Return a pygame img of the PNG img_name that has been scaled according
-    to the given width and size
+    to the given width and size, and mirrored left-to-right if <flipped>.
+
+    The image is shared with every other caller asking for the same one, so
+    it must not be drawn on.
+    """
+    key = (img_name, width, height, flipped)
+    if key not in _IMAGE_CACHE:
+        img = pygame.image.load(img_name).convert_alpha()
+        img = pygame.transform.scale(img, (width, height))
+        if flipped:
+            img = pygame.transform.flip(img, True, False)
+        _IMAGE_CACHE[key] = img
+    return _IMAGE_CACHE[key]
+
+
+def preload_images() -> None:
+    """
+    Load every image an actor can show into the image cache, so that no image
+    is read or scaled while the game is being played.
     """
-    img = pygame.image.load(img_name).convert_alpha()
-    return pygame.transform.scale(img, (width, height))
+    for img_name in [PLAYER_SPRITE_R1, PLAYER_SPRITE_R2]:
+        load_image(img_name)
+        load_image(img_name, flipped=True)
+    for img_name in [PLAYER_SPRITE_U1, PLAYER_SPRITE_U2, PLAYER_SPRITE_B1,
+                     PLAYER_SPRITE_B2, BUSH_SPRITE, WALL_SPRITE, ROCK_SPRITE,
+                     FLAG_SPRITE, IS_PURPLE, IS_DARK_BLUE, IS_LIGHT_BLUE] \
+            + list(WORDS_SPRITES.values()):
+        load_image(img_name)
 
 
 if __name__ == "__main__":
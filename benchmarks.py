@@ -0,0 +1,218 @@
+"""
+=== Module Description ===
+This module contains the benchmarks of the core game operations, for catching
+performance regressions in the hot paths.
+
+Each operation is timed on the bundled maps and on synthetic maps of growing
+size, and the results are printed (or written) as JSON, so that the results
+of two commits can be compared. Run it from the repository root, like the
+game itself:
+
+    python benchmarks.py --output before.json
+
+Drawing is timed offscreen, on SDL's dummy video driver.
+"""
+
+from typing import Any, Callable, Dict, List, Optional
+import argparse
+import glob
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+from settings import *
+from game import Game
+from memory import memory_report
+
+SIZES = [20, 50, 100, 200, 500, 1000]
+
+
+def synthetic_map(width: int, height: int, seed: int = 0) -> List[str]:
+    """
+    Return the lines of a <width> by <height> map (at least 20 by 10) for
+    benchmarking: a Bush border, the rules "Meepo isYou", "Wall isPush",
+    "Flag isVictory" and "Rock isStop", the player with a row of walls right
+    in front of it to push, a flag in the far corner, and walls and rocks on
+    about a tenth of the other tiles.
+    """
+    rng = random.Random(seed)
+    rows = [["."] * width for _ in range(height)]
+    for x in range(width):
+        rows[0][x] = rows[height - 1][x] = "1"
+    for y in range(height):
+        rows[y][0] = rows[y][width - 1] = "1"
+    for i, word in enumerate(["MIY", "WIP", "FIV", "RIS"]):
+        for j, tile in enumerate(word):
+            rows[1][1 + 4 * i + j] = tile
+    rows[3][2] = "2"
+    for x in range(3, 3 + push_chain_length(width)):
+        rows[3][x] = "3"
+    for y in range(5, height - 1):
+        for x in range(1, width - 1):
+            if rng.random() < 0.1:
+                rows[y][x] = rng.choice("34")
+    rows[height - 2][width - 2] = "5"
+    return ["".join(row) for row in rows]
+
+
+def push_chain_length(width: int) -> int:
+    """
+    Return the number of walls the player pushes in a synthetic map that is
+    <width> tiles wide.
+    """
+    return width // 4
+
+
+def measure(operation: Callable[[], Any],
+            setup: Optional[Callable[[], Any]] = None, repeat: int = 20,
+            budget: float = 2.0) -> Dict[str, Any]:
+    """
+    Return the mean and the minimum time in seconds of calling <operation>,
+    and the number of runs timed.
+
+    <setup> is called before every run, untimed. There are <repeat> runs,
+    or fewer if they take more than <budget> seconds in total (but at least
+    one).
+    """
+    times = []
+    while len(times) < repeat and (not times or sum(times) < budget):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        operation()
+        times.append(time.perf_counter() - start)
+    return {"mean": sum(times) / len(times), "min": min(times),
+            "runs": len(times)}
+
+
+def load_game(path: str, headless: bool = True) -> Game:
+    """
+    Return a new game of the map at <path>, with its rules in effect.
+    """
+    game = Game(headless)
+    game.load_map(path)
+    game.new()
+    game._update()
+    return game
+
+
+def benchmark_map(path: str, repeat: int = 20,
+                  budget: float = 2.0) -> Dict[str, Any]:
+    """
+    Return the timings of the core operations on the map at <path>.
+
+    "move" is a keypress moving the player right, pushing whatever is in
+    the way, and "update" the rule update of the frame after it; each is
+    undone, untimed, before the next run. "undo" undoes such a move.
+    "update_all" checks every rule again, as after loading a map.
+    "draw_full" and "draw_move" redraw the whole window and the frame after
+    a move. "memory" is the memory report of the game after 20 random moves
+    (see memory.py).
+    """
+    def time_it(operation, setup=None):
+        return measure(operation, setup, repeat, budget)
+
+    game = load_game(path)
+    results = {"map": os.path.basename(path),
+               "size": [game.x_tiles, game.y_tiles],
+               "actors": len(game.get_actors()),
+               "rules": list(game.get_rules())}
+    results["load"] = time_it(lambda: load_game(path))
+
+    def undo_all():
+        while not game._history.is_empty():
+            game._undo()
+        game._update()
+
+    results["move"] = time_it(lambda: game._play_move((1, 0)), undo_all)
+    results["update"] = time_it(game._update,
+                                lambda: (undo_all(), game._play_move((1, 0))))
+    results["update_all"] = time_it(game._update, game._index_actors)
+    results["undo"] = time_it(game._undo, lambda: (undo_all(),
+                                                   game.step(1, 0)))
+    undo_all()
+    results["copy"] = time_it(game._copy)
+    results["win_or_lose"] = time_it(game.win_or_lose)
+    moves = random.Random(0)
+    for _ in range(20):
+        if game.player is not None and game.get_outcome() is None:
+            game.step(*moves.choice([(1, 0), (-1, 0), (0, 1), (0, -1)]))
+    results["memory"] = memory_report(game)
+
+    window = load_game(path, headless=False)
+    window._draw()
+
+    def redraw_all():
+        window._full_redraw = True
+
+    def after_move():
+        while not window._history.is_empty():
+            window._undo()
+        window._update()
+        window._draw()
+        window.step(1, 0)
+
+    results["draw_full"] = time_it(window._draw, redraw_all)
+    results["draw_move"] = time_it(window._draw, after_move)
+    return results
+
+
+def run(sizes: List[int], repeat: int = 20,
+        budget: float = 2.0) -> Dict[str, Any]:
+    """
+    Return the timings of the core operations on every bundled map and on a
+    synthetic map of every size in <sizes>, with a description of the
+    machine they were taken on.
+    """
+    maps_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            "maps")
+    results = []
+    for path in sorted(glob.glob(os.path.join(maps_dir, "*map*.txt"))):
+        results.append(benchmark_map(path, repeat, budget))
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            path = os.path.join(tmp, "synthetic_{0}x{0}.txt".format(size))
+            with open(path, "wt") as f:
+                f.write("\n".join(synthetic_map(size, size)) + "\n")
+            results.append(benchmark_map(path, repeat, budget))
+    return {"python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "results": results}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Run the benchmarks and print the results as JSON, or write them to the
+    file given by --output.
+    """
+    parser = argparse.ArgumentParser(
+        description="Time the core game operations.")
+    parser.add_argument("--sizes", type=int, nargs="*", default=SIZES,
+                        help="sides of the synthetic square maps")
+    parser.add_argument("--repeat", type=int, default=20,
+                        help="runs of each operation")
+    parser.add_argument("--budget", type=float, default=2.0,
+                        help="seconds after which to stop repeating an "
+                             "operation")
+    parser.add_argument("--output", help="file to write the JSON to")
+    args = parser.parse_args(argv)
+    report = run(args.sizes, args.repeat, args.budget)
+    if args.output:
+        with open(args.output, "wt") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
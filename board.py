@@ -0,0 +1,549 @@
+"""
+=== Module Description ===
+This module contains the Board class, a compact representation of a game
+stored in NumPy arrays. It follows the same rules as the Actor objects used by
+the Game class, and can be used instead of them where speed or memory matters
+(e.g. very large maps, or searching for a solution), or to check them.
+"""
+
+from typing import Dict, List, Optional, Set, Tuple
+import numpy as np
+from settings import *
+import actor
+import mapcache
+
+# Type codes. Characters use the same digits as in the map files (see
+# CHARACTERS); word blocks follow. EMPTY is never the type of an actor.
+EMPTY = 0
+BUSH, MEEPO, WALL, ROCK, FLAG = 1, 2, 3, 4, 5
+CHARACTER_CODES = {name: int(digit) for digit, name in CHARACTERS.items()}
+SUBJECT_CODES = {word: 6 + i for i, word in enumerate(SUBJECTS.values())}
+ATTRIBUTE_CODES = {word: 6 + len(SUBJECTS) + i
+                   for i, word in enumerate(ATTRIBUTES.values())}
+IS = 6 + len(SUBJECTS) + len(ATTRIBUTES)
+NUM_CODES = IS + 1
+
+# Property bits
+STOP, PUSH, WIN, LOSE, YOU = 1, 2, 4, 8, 16
+ATTRIBUTE_BITS = {ATTRIBUTES["S"]: STOP, ATTRIBUTES["P"]: PUSH,
+                  ATTRIBUTES["V"]: WIN, ATTRIBUTES["L"]: LOSE,
+                  ATTRIBUTES["Y"]: YOU}
+
+# The word written on each word block, by type code
+WORDS = {}
+for _word, _code in SUBJECT_CODES.items():
+    WORDS[_code] = _word
+for _word, _code in ATTRIBUTE_CODES.items():
+    WORDS[_code] = _word
+WORDS[IS] = " is"
+
+# Lookup tables by type code
+IS_CHARACTER = np.zeros(NUM_CODES, dtype=bool)
+IS_CHARACTER[[MEEPO, WALL, ROCK, FLAG]] = True
+IS_SUBJECT = np.zeros(NUM_CODES, dtype=bool)
+IS_SUBJECT[list(SUBJECT_CODES.values())] = True
+IS_ATTRIBUTE = np.zeros(NUM_CODES, dtype=bool)
+IS_ATTRIBUTE[list(ATTRIBUTE_CODES.values())] = True
+
+
+def tile_code(tile: str) -> int:
+    """
+    Return the type code of the actor on a map tile, or EMPTY if there is no
+    actor on it.
+    """
+    if tile.isnumeric():
+        return CHARACTER_CODES[CHARACTERS[tile]]
+    elif tile in SUBJECTS:
+        return SUBJECT_CODES[SUBJECTS[tile]]
+    elif tile in ATTRIBUTES:
+        return ATTRIBUTE_CODES[ATTRIBUTES[tile]]
+    elif tile == 'I':
+        return IS
+    return EMPTY
+
+
+# The type code of the actor of every map character, by its byte value
+TILE_CODES = np.zeros(256, dtype=np.int8)
+for _tile in list(CHARACTERS) + list(SUBJECTS) + list(ATTRIBUTES) + ['I']:
+    TILE_CODES[ord(_tile)] = tile_code(_tile)
+
+
+def actor_code(actor_: actor.Actor) -> int:
+    """
+    Return the type code of <actor_>.
+    """
+    if isinstance(actor_, actor.Subject):
+        return SUBJECT_CODES[actor_.word]
+    elif isinstance(actor_, actor.Attribute):
+        return ATTRIBUTE_CODES[actor_.word]
+    elif isinstance(actor_, actor.Is):
+        return IS
+    return CHARACTER_CODES[type(actor_).__name__]
+
+
+class Board:
+    """
+    A game stored in NumPy arrays.
+
+    Actors are numbered in the order Game.new creates them, and are described
+    by their type code and position. Properties (stop, push, win, lose, you)
+    are bitmasks kept per type code, since every rule applies to all the
+    actors of a type. Several actors may share a cell; cells holds the first
+    actor of each cell and next_in_cell links it to the others, in order.
+
+    === Public Attributes ===
+    width, height:
+        Size of the map in tiles
+    codes:
+        Type code of each actor
+    xs, ys:
+        Position of each actor
+    alive:
+        Whether each actor is still in the game (the player is removed on a
+        loss)
+    props:
+        Property bits of each type code
+    cells:
+        For each cell of the map, the first actor in it, or -1 if it is empty
+    next_in_cell:
+        For each actor, the next actor in the same cell, or -1
+    player:
+        The actor that is the player, or -1 if there is none
+    rules:
+        The rules in effect, in the same order as Game.get_rules
+    outcome:
+        "win" or "lose" once the game has been won or lost, otherwise None
+
+    === Private Attributes ===
+    _outside:
+        The actors that have left the map, by cell, in order
+    _is_blocks:
+        The "Is" blocks, in order
+    _is_rules:
+        The (horizontal, vertical) rules read off each "Is" block at the last
+        update, or None before the first update
+    _dirty:
+        The cells whose actors changed since the last update
+    """
+    width: int
+    height: int
+    codes: np.ndarray
+    xs: np.ndarray
+    ys: np.ndarray
+    alive: np.ndarray
+    props: np.ndarray
+    cells: np.ndarray
+    next_in_cell: np.ndarray
+    player: int
+    rules: List[str]
+    outcome: Optional[str]
+    _outside: Dict[Tuple[int, int], List[int]]
+    _is_blocks: List[int]
+    _is_rules: Optional[Dict[int, Tuple[str, str]]]
+    _dirty: Set[Tuple[int, int]]
+
+    def __init__(self, width: int, height: int, codes: np.ndarray,
+                 xs: np.ndarray, ys: np.ndarray) -> None:
+        """
+        Initialize a Board with the given actors, before any rule is applied.
+        """
+        self.width, self.height = width, height
+        self.codes = codes.astype(np.int8)
+        self.xs = xs.astype(np.int32)
+        self.ys = ys.astype(np.int32)
+        self.alive = np.ones(len(codes), dtype=bool)
+        self.props = np.zeros(NUM_CODES, dtype=np.uint8)
+        self.props[BUSH] = STOP
+        self.props[IS_SUBJECT | IS_ATTRIBUTE] = STOP | PUSH
+        self.props[IS] = STOP | PUSH
+        self.cells = np.full((height, width), -1, dtype=np.int32)
+        self.next_in_cell = np.full(len(codes), -1, dtype=np.int32)
+        self.player = -1
+        self.rules = []
+        self.outcome = None
+        self._outside = {}
+        self._is_blocks = [int(i) for i in np.flatnonzero(self.codes == IS)]
+        self._is_rules = None
+        self._dirty = set()
+        # Adding in reverse order puts each actor at the front of its cell.
+        for i in range(len(codes) - 1, -1, -1):
+            self._add(i)
+
+    @classmethod
+    def from_map_data(cls, map_data: List[str]) -> 'Board':
+        """
+        Return a new Board with the actors of <map_data>, the lines of a map
+        file as read by Game.load_map.
+        """
+        codes, xs, ys = [], [], []
+        for col, tiles in enumerate(map_data):
+            for row, tile in enumerate(tiles):
+                code = tile_code(tile)
+                if code != EMPTY:
+                    codes.append(code)
+                    xs.append(row)
+                    ys.append(col)
+        return cls(len(map_data[0]), len(map_data), np.array(codes),
+                   np.array(xs), np.array(ys))
+
+    @classmethod
+    def from_compiled(cls, compiled: mapcache.CompiledMap) -> 'Board':
+        """
+        Return a new Board with the actors of <compiled>, a compiled map.
+        """
+        codes = TILE_CODES[np.frombuffer(compiled.tiles, dtype=np.uint8)]
+        return cls(compiled.width, compiled.height, codes,
+                   np.frombuffer(compiled.xs, dtype=compiled.xs.typecode),
+                   np.frombuffer(compiled.ys, dtype=compiled.ys.typecode))
+
+    @classmethod
+    def from_file(cls, path: str) -> 'Board':
+        """
+        Return a new Board with the actors of the map file at <path>, read
+        through the cache of compiled maps (see mapcache.py).
+        """
+        return cls.from_compiled(mapcache.load(path))
+
+    @classmethod
+    def from_game(cls, game_: 'Game') -> 'Board':
+        """
+        Return a new Board in the current state of <game_>: its actors, their
+        properties, its player, rules and outcome.
+        """
+        actors = game_.get_actors()
+        codes = np.array([actor_code(ac) for ac in actors], dtype=np.int8)
+        board = cls(game_.x_tiles, game_.y_tiles, codes,
+                    np.array([ac.x for ac in actors]),
+                    np.array([ac.y for ac in actors]))
+        for ac, code in zip(actors, codes):
+            if IS_CHARACTER[code]:
+                board.props[code] = (STOP * ac.is_stop() + PUSH * ac.is_push()
+                                     + WIN * ac.is_win() + LOSE * ac.is_lose()
+                                     + YOU * ac.is_player())
+        if game_.player in actors:
+            board.player = actors.index(game_.player)
+        board.rules = list(game_.get_rules())
+        board.outcome = game_.get_outcome()
+        return board
+
+    def copy(self) -> 'Board':
+        """
+        Return a copy of this Board.
+        """
+        new = Board.__new__(Board)
+        new.width, new.height = self.width, self.height
+        new.codes = self.codes
+        new.xs = self.xs.copy()
+        new.ys = self.ys.copy()
+        new.alive = self.alive.copy()
+        new.props = self.props.copy()
+        new.cells = self.cells.copy()
+        new.next_in_cell = self.next_in_cell.copy()
+        new.player = self.player
+        new.rules = list(self.rules)
+        new.outcome = self.outcome
+        new._outside = {cell: list(actors)
+                        for cell, actors in self._outside.items()}
+        new._is_blocks = self._is_blocks
+        new._is_rules = None if self._is_rules is None \
+            else dict(self._is_rules)
+        new._dirty = set(self._dirty)
+        return new
+
+    def key(self) -> bytes:
+        """
+        Return a canonical encoding of the state of this Board: equal states
+        (same positions, properties, player, rules and outcome) give equal
+        keys.
+        """
+        return b"".join([self.xs.tobytes(), self.ys.tobytes(),
+                         self.alive.tobytes(), self.props.tobytes(),
+                         np.int32(self.player).tobytes(),
+                         "|".join(self.rules).encode(),
+                         (self.outcome or "").encode()])
+
+    def _in_map(self, x: int, y: int) -> bool:
+        """
+        Return whether (x, y) is a cell of the map.
+        """
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def in_bounds(self, margin: int) -> bool:
+        """
+        Return whether every actor that has left the map is at most <margin>
+        cells away from it.
+        """
+        return all(-margin <= x < self.width + margin
+                   and -margin <= y < self.height + margin
+                   for x, y in self._outside)
+
+    def get_actor(self, x: int, y: int) -> int:
+        """
+        Return the first actor at (x, y), or -1 if there is none.
+        """
+        if self._in_map(x, y):
+            return int(self.cells[y, x])
+        actors = self._outside.get((x, y))
+        return actors[0] if actors else -1
+
+    def get_actors_at(self, x: int, y: int) -> List[int]:
+        """
+        Return all the actors at (x, y), in order.
+        """
+        if not self._in_map(x, y):
+            return list(self._outside.get((x, y), []))
+        actors = []
+        i = int(self.cells[y, x])
+        while i >= 0:
+            actors.append(i)
+            i = int(self.next_in_cell[i])
+        return actors
+
+    def _add(self, i: int) -> None:
+        """
+        Put actor <i> in the cell at its position.
+        """
+        x, y = int(self.xs[i]), int(self.ys[i])
+        if not self._in_map(x, y):
+            actors = self._outside.setdefault((x, y), [])
+            actors.append(i)
+            actors.sort()
+            return
+        prev, j = -1, int(self.cells[y, x])
+        while 0 <= j < i:
+            prev, j = j, int(self.next_in_cell[j])
+        self.next_in_cell[i] = j
+        if prev < 0:
+            self.cells[y, x] = i
+        else:
+            self.next_in_cell[prev] = i
+
+    def _remove(self, i: int) -> None:
+        """
+        Take actor <i> out of the cell at its position.
+        """
+        x, y = int(self.xs[i]), int(self.ys[i])
+        if not self._in_map(x, y):
+            actors = self._outside[(x, y)]
+            actors.remove(i)
+            if not actors:
+                del self._outside[(x, y)]
+            return
+        prev, j = -1, int(self.cells[y, x])
+        while j != i:
+            prev, j = j, int(self.next_in_cell[j])
+        if prev < 0:
+            self.cells[y, x] = self.next_in_cell[i]
+        else:
+            self.next_in_cell[prev] = self.next_in_cell[i]
+        self.next_in_cell[i] = -1
+
+    def _shift(self, i: int, dx: int, dy: int) -> None:
+        """
+        Move actor <i> by (dx, dy) without checking anything.
+        """
+        self._dirty.add((int(self.xs[i]), int(self.ys[i])))
+        self._remove(i)
+        self.xs[i] += dx
+        self.ys[i] += dy
+        self._add(i)
+        self._dirty.add((int(self.xs[i]), int(self.ys[i])))
+
+    def move(self, i: int, dx: int, dy: int) -> bool:
+        """
+        Move actor <i> by (dx, dy), pushing the actors in the way, the same
+        way as Actor.move. Return whether actor <i> actually moves.
+        """
+        chain = []
+        x, y = int(self.xs[i]) + dx, int(self.ys[i]) + dy
+        while True:
+            j = self.get_actor(x, y)
+            if j < 0:
+                break
+            props = self.props[self.codes[j]]
+            if props & PUSH:
+                chain.append(j)
+                x, y = x + dx, y + dy
+            elif props & STOP:
+                return False
+            else:
+                break
+        for j in reversed(chain):
+            self._shift(j, dx, dy)
+        self._shift(i, dx, dy)
+        return True
+
+    def _first_many(self, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        """
+        Return the first actor at each of the cells (xs[k], ys[k]), or -1.
+        """
+        inside = (xs >= 0) & (xs < self.width) & (ys >= 0) & (ys < self.height)
+        first = np.full(len(xs), -1, dtype=np.int32)
+        first[inside] = self.cells[ys[inside], xs[inside]]
+        if self._outside:
+            for k in np.flatnonzero(~inside):
+                first[k] = self.get_actor(int(xs[k]), int(ys[k]))
+        return first
+
+    def find_rules(self) -> List[str]:
+        """
+        Return the rules spelled out by the word blocks, in the same order as
+        Game._update finds them.
+
+        Every "Is" block is read at once; update reads only the ones next to
+        a change.
+        """
+        is_blocks = np.array(self._is_blocks, dtype=np.int64)
+        xs, ys = self.xs[is_blocks], self.ys[is_blocks]
+        around = [self._first_many(xs, ys - 1), self._first_many(xs, ys + 1),
+                  self._first_many(xs - 1, ys), self._first_many(xs + 1, ys)]
+        up, down, left, right = [np.where(a >= 0, self.codes[a], EMPTY)
+                                 for a in around]
+        vertical = IS_SUBJECT[up] & IS_ATTRIBUTE[down]
+        horizontal = IS_SUBJECT[left] & IS_ATTRIBUTE[right]
+
+        self._is_rules = {i: ("", "") for i in self._is_blocks}
+        for k in np.flatnonzero(vertical | horizontal):
+            found = ["", ""]
+            if horizontal[k]:
+                found[0] = WORDS[left[k]] + WORDS[IS] + WORDS[right[k]]
+            if vertical[k]:
+                found[1] = WORDS[up[k]] + WORDS[IS] + WORDS[down[k]]
+            self._is_rules[self._is_blocks[k]] = (found[0], found[1])
+        self._dirty = set()
+        return self._merge_rules()
+
+    def _read_rules(self, i: int) -> Tuple[str, str]:
+        """
+        Return the (horizontal, vertical) rules spelled out around the "Is"
+        block <i>, like Is.update.
+        """
+        x, y = int(self.xs[i]), int(self.ys[i])
+        up, down, left, right = [
+            int(self.codes[j]) if j >= 0 else EMPTY
+            for j in [self.get_actor(x, y - 1), self.get_actor(x, y + 1),
+                      self.get_actor(x - 1, y), self.get_actor(x + 1, y)]]
+        horizontal = ""
+        vertical = ""
+        if IS_SUBJECT[up] and IS_ATTRIBUTE[down]:
+            vertical = WORDS[up] + WORDS[IS] + WORDS[down]
+        if IS_SUBJECT[left] and IS_ATTRIBUTE[right]:
+            horizontal = WORDS[left] + WORDS[IS] + WORDS[right]
+        return horizontal, vertical
+
+    def _merge_rules(self) -> List[str]:
+        """
+        Return the rules read off all the "Is" blocks, in order, without
+        repeats.
+        """
+        rules = []
+        for i in self._is_blocks:
+            for rule in self._is_rules[i]:
+                if rule and rule not in rules:
+                    rules.append(rule)
+        return rules
+
+    def update(self) -> None:
+        """
+        Find the rules on the board and apply the ones added and removed
+        since the last update, the same way as Game._update: only the "Is"
+        blocks on or next to a cell that changed are read again.
+        """
+        if self._is_rules is None:
+            new_rules = self.find_rules()
+        else:
+            if not self._dirty:
+                return
+            changed = False
+            for i in self._dirty_is_blocks():
+                found = self._read_rules(i)
+                if self._is_rules[i] != found:
+                    self._is_rules[i] = found
+                    changed = True
+            self._dirty = set()
+            if not changed:
+                return
+            new_rules = self._merge_rules()
+
+        for rule in self.rules:
+            if rule not in new_rules:
+                self._apply_rule(rule, False)
+        for rule in new_rules:
+            if rule not in self.rules:
+                self._apply_rule(rule, True)
+        self.rules = new_rules
+
+    def _dirty_is_blocks(self) -> Set[int]:
+        """
+        Return the "Is" blocks on or next to a cell that changed since the
+        last update.
+        """
+        is_blocks = set()
+        for x, y in self._dirty:
+            for cell in [(x, y), (x, y - 1), (x, y + 1), (x - 1, y),
+                         (x + 1, y)]:
+                for i in self.get_actors_at(*cell):
+                    if self.codes[i] == IS:
+                        is_blocks.add(i)
+        return is_blocks
+
+    def _apply_rule(self, rule: str, add: bool) -> None:
+        """
+        Apply <rule> to the game if <add>, otherwise remove it, changing the
+        properties the same way as the setters and unsetters of Character.
+        """
+        subject, attribute = rule.split()
+        code = CHARACTER_CODES[subject]
+        bit = ATTRIBUTE_BITS[attribute[2:]]
+        actors = np.flatnonzero((self.codes == code) & self.alive)
+        if not add:
+            if bit == YOU:
+                if len(actors) and self.props[code] & YOU:
+                    self.player = -1
+            if len(actors):
+                self.props[code] &= 0xFF ^ bit
+            return
+        if not len(actors):
+            return
+        if bit in (STOP, PUSH, YOU):
+            self.props[code] &= 0xFF ^ (STOP | PUSH | YOU)
+        elif bit in (WIN, LOSE):
+            self.props[code] &= 0xFF ^ (WIN | LOSE)
+        self.props[code] |= bit
+        if bit == YOU:
+            self.player = int(actors[-1])
+
+    def win_or_lose(self) -> bool:
+        """
+        Check whether the player stands on something that wins or loses the
+        game, the same way as Game.win_or_lose.
+        Returns True if the game is won or lost; otherwise return False
+        """
+        p = self.player
+        for i in self.get_actors_at(int(self.xs[p]), int(self.ys[p])):
+            code = self.codes[i]
+            if IS_CHARACTER[code]:
+                if self.props[code] & WIN:
+                    self.outcome = "win"
+                    return True
+                elif self.props[code] & LOSE:
+                    self._remove(p)
+                    self._dirty.add((int(self.xs[p]), int(self.ys[p])))
+                    self.alive[p] = False
+                    self.player = -1
+                    self.outcome = "lose"
+                    return True
+        return False
+
+    def step(self, dx: int, dy: int) -> bool:
+        """
+        Play one move of the player by (dx, dy) and then update the rules,
+        the same way as Game.step. Returns whether the player actually moved.
+        """
+        if self.player < 0:
+            return False
+        moved = self.move(self.player, dx, dy)
+        if moved:
+            self.win_or_lose()
+        self.update()
+        return moved
@@ -9,17 +9,92 @@ University of Toronto Mississauga
 This module contains the Game class and the main game application.
 """
 
-from typing import Any, Type, Tuple, List, Sequence, Optional
+from typing import Any, Callable, Type, Tuple, List, Sequence, Optional, \
+    Dict, Set
+import functools
+from array import array
 import pygame
 from settings import *
-from stack import Stack
+from grid import Grid
+from history import Delta, History, PackedDelta
+from zobrist import zobrist_key
+import mapcache
+import savegame
 import actor
 
+# The (character class, attribute) of every rule parsed so far, e.g.
+# (actor.Wall, "Push") for "Wall isPush"
+_PARSED_RULES: Dict[str, Tuple[Optional[Type[Any]], str]] = {}
+
+# The function making the actor of every map character at a given (x, y)
+_CONSTRUCTORS: Dict[str, Callable[[int, int], actor.Actor]] = {"I": actor.Is}
+_CONSTRUCTORS.update((tile, getattr(actor, name))
+                     for tile, name in CHARACTERS.items())
+_CONSTRUCTORS.update((tile, functools.partial(actor.Subject, word_=word))
+                     for tile, word in SUBJECTS.items())
+_CONSTRUCTORS.update((tile, functools.partial(actor.Attribute, word_=word))
+                     for tile, word in ATTRIBUTES.items())
+
+# The map character of every kind of actor (see Game._kind) but "Is", e.g.
+# "3" for "Wall" and "W" for "SubjectWall"
+_TILES = {name: tile for tile, name in CHARACTERS.items()}
+_TILES.update(("Subject" + word, tile) for tile, word in SUBJECTS.items())
+_TILES.update(("Attribute" + word, tile) for tile, word in ATTRIBUTES.items())
+
+
+class MovePreview:
+    """
+    What a move of the player would do, as found by Game.preview_move
+    without making it.
+
+    === Public Attributes ===
+    direction:
+        The move, (dx, dy)
+    moved:
+        Whether the player would move
+    shifted:
+        The actors that would move: the player, then the line of actors it
+        would push, nearest first. Empty if the player would not move.
+    outcome:
+        "win" or "lose" if the move would end the game, otherwise None
+    """
+    direction: Tuple[int, int]
+    moved: bool
+    shifted: List[actor.Actor]
+    outcome: Optional[str]
+
+    def __init__(self, direction: Tuple[int, int], moved: bool = False,
+                 shifted: Optional[List[actor.Actor]] = None,
+                 outcome: Optional[str] = None) -> None:
+        """
+        Initialize a MovePreview of the move <direction>.
+        """
+        self.direction = direction
+        self.moved = moved
+        self.shifted = [] if shifted is None else shifted
+        self.outcome = outcome
+
 
 class Game:
     """
     Class representing the game.
+
+    A headless game has no window and loads no images: it only loads maps,
+    applies moves (see step), evaluates rules and detects a win or a loss,
+    the same way the game with a window does.
+
+    If profiler is set to a FrameProfiler (see profiler.py), every frame of
+    run is timed and counted into it. If replay is set to a Replay (see
+    start_recording), every move, undo and rule update is recorded into
+    it. If save_path is set, the game saves itself there with its undo
+    history every AUTOSAVE_EVERY moves (see save), to be restored after a
+    crash.
+
+    The window shows at most VIEW_TILES of the map. On a bigger map it is a
+    view of the map from camera, its top left tile, which scrolls to follow
+    the player; only the actors in view are drawn.
     """
+    headless: bool
     size: Tuple[int, int]
     width: int
     height: int
@@ -28,76 +103,335 @@ class Game:
     y_tiles: int
     tiles_number: Tuple[int, int]
     background: Optional[pygame.Surface]
+    camera: Tuple[int, int]
 
     _actors: List[actor.Actor]
+    _grid: Grid
+    _ranked: List[actor.Actor]
+    _by_type: Dict[Type[actor.Actor], List[actor.Actor]]
+    _properties: Dict[Type[actor.Character], actor.Properties]
     _is: List[actor.Is]
+    _is_rules: Dict[actor.Is, Tuple[str, str]]
+    _dirty_cells: Set[Tuple[int, int]]
+    _dirty_tiles: Set[Tuple[int, int]]
+    _full_redraw: bool
+    _drawn_player: Optional[actor.Actor]
     _running: bool
+    _outcome: Optional[str]
     _rules: List[str]
-    _history: Stack()
+    _history: History
+    _delta: Optional[Delta]
+    _hash: int
+    _compiled: Optional[mapcache.CompiledMap]
+    _map_data: Optional[List[str]]
+    _unsaved: int
 
     player: Optional[actor.Actor]
-    map_data: List[str]
+    board: Optional['Board']
+    profiler: Optional['FrameProfiler']
+    replay: Optional['Replay']
+    save_path: Optional[str]
     keys_pressed: Optional[Sequence[bool]]
 
-    def __init__(self) -> None:
+    def __init__(self, headless: bool = False) -> None:
         """
         Initialize variables for this Class.
         """
+        self.headless = headless
         self.width, self.height = 0, 0
         self.size = (self.width, self.height)
         self.screen = None
         self.x_tiles, self.y_tiles = (0, 0)
         self.tiles_number = (self.x_tiles, self.y_tiles)
         self.background = None
+        self.camera = (0, 0)
 
         self._actors = []
+        self._grid = Grid()
+        self._ranked = []
+        self._by_type = {}
+        self._properties = {}
         self._is = []
+        self._is_rules = {}
+        self._dirty_cells = set()
+        self._dirty_tiles = set()
+        self._full_redraw = True
+        self._drawn_player = None
         self._rules = []
         self._running = True
-        self._history = Stack()
+        self._outcome = None
+        self._history = History(HISTORY_MAX_ENTRIES, HISTORY_MAX_BYTES,
+                                HISTORY_POLICY, HISTORY_PACK_AFTER,
+                                self._pack, self._unpack)
+        self._delta = None
+        self._hash = 0
+        self._compiled = None
+        self._map_data = []
+        self._unsaved = 0
 
         self.player = None
-        self.map_data = []
+        self.board = None
+        self.profiler = None
+        self.replay = None
+        self.save_path = None
         self.keys_pressed = None
 
     def load_map(self, path: str) -> None:
         """
         Reads a .txt file representing the map
+
+        The map is compiled into the list of its actors (see mapcache.py),
+        or read compiled from the cache if it was loaded before, so that new
+        does not have to scan it tile by tile, and map_data is only rebuilt
+        from it if it is needed. A map loaded after another one is added
+        below it.
+        """
+        compiled = mapcache.load(path)
+        if self._compiled is None and not self._map_data:
+            self._compiled = compiled
+            self._map_data = None
+            self._set_size(compiled.width, compiled.height)
+            return
+        self.map_data = self.map_data + compiled.get_lines()
+        self._set_size(len(self.map_data[0]), len(self.map_data))
+
+    @property
+    def map_data(self) -> List[str]:
+        """
+        The lines of the map, rebuilt from the compiled map loaded by
+        load_map the first time they are needed
         """
-        with open(path, 'rt') as f:
-            for line in f:
-                self.map_data.append(line.strip())
+        if self._map_data is None:
+            self._map_data = self._compiled.get_lines()
+        return self._map_data
 
-        self.width = (len(self.map_data[0])) * TILESIZE
-        self.height = len(self.map_data) * TILESIZE
+    @map_data.setter
+    def map_data(self, lines: List[str]) -> None:
+        self._map_data = lines
+        self._compiled = None
+
+    def _set_size(self, x_tiles: int, y_tiles: int) -> None:
+        """
+        Set the size of the map to <x_tiles> by <y_tiles>, and the size of
+        the window to match.
+        """
+        self.x_tiles, self.y_tiles = x_tiles, y_tiles
+        self.width = min(self.x_tiles, VIEW_TILES[0]) * TILESIZE
+        self.height = min(self.y_tiles, VIEW_TILES[1]) * TILESIZE
         self.size = (self.width, self.height)
-        self.x_tiles, self.y_tiles = len(self.map_data[0]), len(self.map_data)
 
         # center the window on the screen
         os.environ['SDL_VIDEO_CENTERED'] = '1'
 
-    def new(self) -> None:
+    def new(self, board: bool = False) -> None:
         """
         Initialize variables to be object on screen.
+        A headless game opens no window and loads no images.
+
+        If <board>, also build a Board of the map (see board.py), a compact
+        copy of the game that can be played on its own. It needs NumPy.
+        """
+        if board:
+            from board import Board
+            if self._compiled is not None:
+                self.board = Board.from_compiled(self._compiled)
+            else:
+                self.board = Board.from_map_data(self.map_data)
+        if not self.headless:
+            self._open_window()
+        if self._compiled is not None:
+            # Every tile of a compiled map holds an actor, so there is
+            # nothing to parse: each is made by the function of its tile.
+            compiled = self._compiled
+            actors, is_blocks = self._actors, self._is
+            for tile, x, y in zip(compiled.tiles.decode(), compiled.xs,
+                                  compiled.ys):
+                ac = _CONSTRUCTORS[tile](x, y)
+                actors.append(ac)
+                if tile == "I":
+                    is_blocks.append(ac)
+        else:
+            for col, tiles in enumerate(self.map_data):
+                for row, tile in enumerate(tiles):
+                    self._add_tile(tile, row, col)
+        self._index_actors()
+        self._hash = self._full_hash()
+
+    def _open_window(self) -> None:
+        """
+        Open the window, of the size of the map, and load the images.
         """
         self.screen = pygame.display.set_mode(self.size)
-        self.background = pygame.image.load(
-            "{}/backgroundBig.png".format(SPRITES_DIR)).convert_alpha()
-        for col, tiles in enumerate(self.map_data):
-            for row, tile in enumerate(tiles):
-                if tile.isnumeric():
-                    self._actors.append(
-                        Game.get_character(CHARACTERS[tile])(row, col))
-                elif tile in SUBJECTS:
-                    self._actors.append(
-                        actor.Subject(row, col, SUBJECTS[tile]))
-                elif tile in ATTRIBUTES:
-                    self._actors.append(
-                        actor.Attribute(row, col, ATTRIBUTES[tile]))
-                elif tile == 'I':
-                    is_tile = actor.Is(row, col)
-                    self._is.append(is_tile)
-                    self._actors.append(is_tile)
+        self.background = actor.load_image(
+            "{}/backgroundBig.png".format(SPRITES_DIR), 1920, 1080)
+        actor.preload_images()
+
+    def _add_tile(self, tile: str, x: int, y: int) -> None:
+        """
+        Add the actor of the map character <tile> at (x, y), if any.
+        """
+        make = _CONSTRUCTORS.get(tile)
+        if make is not None:
+            ac = make(x, y)
+            self._actors.append(ac)
+            if tile == "I":
+                self._is.append(ac)
+
+    def _index_actors(self) -> None:
+        """
+        Place every actor in _actors in this game and rebuild the grid index
+        of their positions and the index of their types from scratch.
+
+        Every "Is" tile is re-evaluated by the next _update, and the whole
+        screen is redrawn by the next _draw.
+        """
+        self._full_redraw = True
+        self._grid.clear()
+        self._ranked = list(self._actors)
+        self._by_type = {}
+        self._is_rules = {}
+        for ac in self._actors:
+            ac.set_game(self)
+            self._grid.add(ac)
+            self._by_type.setdefault(type(ac), []).append(ac)
+            self._dirty_cells.add((ac.x, ac.y))
+
+    def _add_to_types(self, actor_: actor.Actor) -> None:
+        """
+        Add <actor_>, which is back in _actors and the grid, to the index of
+        types, where the actors of each type are kept in the order of
+        _actors.
+        """
+        actors = self._by_type.setdefault(type(actor_), [])
+        rank = self._grid.get_rank(actor_)
+        i = len(actors)
+        while i > 0 and self._grid.get_rank(actors[i - 1]) > rank:
+            i -= 1
+        actors.insert(i, actor_)
+
+    def get_properties(self, type_: Type[actor.Character]) \
+            -> actor.Properties:
+        """
+        Return the properties the rules give to the characters of class
+        <type_> in this game, which all of them share.
+        """
+        properties = self._properties.get(type_)
+        if properties is None:
+            properties = actor.Properties()
+            self._properties[type_] = properties
+        return properties
+
+    def get_actors_of_type(self, type_: Type[actor.Actor]) \
+            -> List[actor.Actor]:
+        """
+        Return the actors of class <type_>, in the order of _actors.
+        """
+        return self._by_type.get(type_, [])
+
+    def actor_moved(self, actor_: actor.Actor, old_x: int, old_y: int) -> None:
+        """
+        Update the index of actors after <actor_> moved from (old_x, old_y).
+        Called by the actor itself whenever its position changes.
+        """
+        self._record(actor_, old_x, old_y)
+        self._hash ^= self._actor_key(actor_, old_x, old_y)
+        self._grid.move(actor_, old_x, old_y)
+        self._hash ^= self._actor_key(actor_)
+        self._dirty_cells.add((old_x, old_y))
+        self._dirty_cells.add((actor_.x, actor_.y))
+        self._dirty_tiles.add((old_x, old_y))
+        self._dirty_tiles.add((actor_.x, actor_.y))
+
+    @staticmethod
+    def _kind(actor_: actor.Actor) -> str:
+        """
+        Return the name of the kind of <actor_> used in the Zobrist hash,
+        e.g. "Wall" for a wall and "SubjectWall" for the word "Wall".
+        """
+        if isinstance(actor_, actor.Block):
+            return type(actor_).__name__ + actor_.word
+        return type(actor_).__name__
+
+    def _actor_key(self, actor_: actor.Actor, x: Optional[int] = None,
+                   y: Optional[int] = None) -> int:
+        """
+        Return the Zobrist number of <actor_> in the cell (x, y) of the grid,
+        by default its current position, where it must be.
+
+        Actors of the same kind in the same cell are told apart by how many
+        of them there are, so that two of them do not cancel out: the number
+        of the nth one is that of the feature (kind, x, y, n). Whichever of
+        them comes or goes, the hash changes by the number of the last one.
+        """
+        if x is None:
+            x, y = actor_.x, actor_.y
+        kind = self._kind(actor_)
+        count = 0
+        for ac in self._grid.get_all(x, y):
+            if self._kind(ac) == kind:
+                count += 1
+        return zobrist_key(kind, x, y, count)
+
+    @staticmethod
+    def _properties_key(type_: Type[actor.Character],
+                        properties: actor.Properties) -> int:
+        """
+        Return the Zobrist number of <properties>, the properties of the
+        characters of class <type_>, or 0 if they have none.
+        """
+        flags = properties.get_flags()
+        if flags == 0:
+            return 0
+        return zobrist_key("properties", type_.__name__, flags)
+
+    def _full_hash(self) -> int:
+        """
+        Return the Zobrist hash of the actors and rules of this game,
+        computed from scratch.
+        """
+        hash_ = 0
+        counts = {}
+        for ac in self._actors:
+            feature = (self._kind(ac), ac.x, ac.y)
+            counts[feature] = counts.get(feature, 0) + 1
+            hash_ ^= zobrist_key(*feature, counts[feature])
+        for type_, properties in self._properties.items():
+            hash_ ^= self._properties_key(type_, properties)
+        for rule in self._rules:
+            hash_ ^= zobrist_key("rule", rule)
+        return hash_
+
+    def get_hash(self) -> int:
+        """
+        Return a 64-bit Zobrist hash of the state of the game: the kind and
+        position of every actor, the properties of every type, the rules in
+        effect and the player. Equal states have equal hashes, so repeated
+        states can be recognised in O(1). The hash is kept up to date as the
+        game changes.
+        """
+        if self.player is None:
+            return self._hash
+        return self._hash ^ zobrist_key("player", self._kind(self.player),
+                                        self.player.x, self.player.y)
+
+    def actor_restyled(self, actor_: actor.Actor) -> None:
+        """
+        Redraw the tile of <actor_> after its sprite changed.
+        Called by the actor itself whenever its sprite changes.
+        """
+        self._dirty_tiles.add((actor_.x, actor_.y))
+
+    def _record(self, actor_: actor.Actor, x: Optional[int] = None,
+                y: Optional[int] = None) -> None:
+        """
+        Record in the open history entry, if any, that <actor_> is about to
+        change. (x, y) is its position before the change, if that differs
+        from its current one.
+        """
+        if self._delta is not None:
+            if x is None:
+                x, y = actor_.x, actor_.y
+            self._delta.record(actor_, x, y)
 
     def get_actors(self) -> List[actor.Actor]:
         """
@@ -105,6 +439,53 @@ class Game:
         """
         return self._actors
 
+    def get_history(self) -> List[Any]:
+        """
+        Return the entries of the undo history, oldest first.
+        """
+        return self._history.to_list()
+
+    def set_history_budget(self, max_entries: Optional[int] = None,
+                           max_bytes: Optional[int] = None,
+                           policy: str = "thin",
+                           pack_after: Optional[int] = None) -> None:
+        """
+        Keep the undo history within <max_entries> entries and <max_bytes>
+        bytes, evicting old entries by <policy>, and keep only <pack_after>
+        entries below the top unpacked (see history.History). None means no
+        limit.
+
+        Raise a ValueError if <policy> is neither "drop" nor "thin".
+        """
+        if policy not in ("drop", "thin"):
+            raise ValueError("unknown eviction policy: " + policy)
+        self._history.max_entries = max_entries
+        self._history.max_bytes = max_bytes
+        self._history.policy = policy
+        self._history.pack_after = pack_after
+        self._history.trim()
+
+    def _pack(self, delta: Delta) -> PackedDelta:
+        """
+        Return <delta>, an entry of the undo history, packed into bytes, with
+        the actors replaced by their ranks in the grid, the properties by the
+        name of their type, and the other values by the numbers the history
+        gives them.
+        """
+        return delta.pack(self._grid.get_rank,
+                          lambda properties:
+                          self._type_of(properties).__name__,
+                          self._history.intern)
+
+    def _unpack(self, packed: PackedDelta) -> Delta:
+        """
+        Return the Delta packed into <packed> by _pack.
+        """
+        return packed.unpack(self._ranked.__getitem__,
+                             lambda name:
+                             self.get_properties(self.get_character(name)),
+                             self._history.get_interned)
+
     def get_running(self) -> bool:
         """
         Getter for _running
@@ -117,59 +498,266 @@ class Game:
         """
         return self._rules
 
+    def get_outcome(self) -> Optional[str]:
+        """
+        Return "win" or "lose" if the game has been won or lost, otherwise
+        return None
+        """
+        return self._outcome
+
     def _draw(self) -> None:
         """
         Draws the screen, grid, and objects/players on the screen
+
+        Only the tiles that changed since the last frame (an actor moved or
+        changed its sprite there, or the player changed) are drawn again and
+        updated on the display. If no tile changed, nothing is drawn.
         """
-        self.screen.blit(self.background,
-                         (((0.5 * self.width) - (0.5 * 1920),
-                           (0.5 * self.height) - (0.5 * 1080))))
-        for actor_ in self._actors:
-            rect = pygame.Rect(actor_.x * TILESIZE,
-                               actor_.y * TILESIZE, TILESIZE, TILESIZE)
-            self.screen.blit(actor_.image, rect)
+        if self.headless:
+            return
+        self._follow_player()
+        if self.player is not self._drawn_player:
+            for ac in [self.player, self._drawn_player]:
+                if ac is not None:
+                    self._dirty_tiles.add((ac.x, ac.y))
+            self._drawn_player = self.player
+
+        if self._full_redraw:
+            self.screen.blit(self.background, self._background_pos())
+            cols, rows = self.width // TILESIZE, self.height // TILESIZE
+            for actor_ in self._grid.get_area(*self.camera, cols, rows):
+                self.screen.blit(actor_.image,
+                                 self._tile_rect(actor_.x, actor_.y))
+
+            # Blit the player at the end to make it above all other objects
+            if self.player and self._in_view(self.player.x, self.player.y):
+                self.screen.blit(self.player.image,
+                                 self._tile_rect(self.player.x,
+                                                 self.player.y))
+
+            pygame.display.flip()
+        elif self._dirty_tiles:
+            rects = []
+            for x, y in self._dirty_tiles:
+                if self._in_view(x, y):
+                    rect = self._tile_rect(x, y)
+                    self._draw_tile(x, y, rect)
+                    rects.append(rect)
+            if rects:
+                pygame.display.update(rects)
+        self._full_redraw = False
+        self._dirty_tiles = set()
+
+    def _follow_player(self) -> None:
+        """
+        Scroll the camera so that the player is at least SCROLL_MARGIN tiles
+        away from the edges of the window, without showing anything beyond
+        the edges of the map. Scrolling redraws the whole window.
+        """
+        if self.player is None:
+            return
+        camera = (self._scroll(self.camera[0], self.player.x,
+                               self.width // TILESIZE, self.x_tiles),
+                  self._scroll(self.camera[1], self.player.y,
+                               self.height // TILESIZE, self.y_tiles))
+        if camera != self.camera:
+            self.camera = camera
+            self._full_redraw = True
+
+    @staticmethod
+    def _scroll(start: int, position: int, view: int, total: int) -> int:
+        """
+        Return the first tile to show, along one axis, of a view <view>
+        tiles long that showed tiles from <start> on, so that it shows
+        <position> away from its ends, in a map <total> tiles long.
+        """
+        margin = min(SCROLL_MARGIN, (view - 1) // 2)
+        if position < start + margin:
+            start = position - margin
+        elif position > start + view - 1 - margin:
+            start = position - view + 1 + margin
+        return max(0, min(start, total - view))
+
+    def _in_view(self, x: int, y: int) -> bool:
+        """
+        Return whether the tile at (x, y) is shown in the window.
+        """
+        return 0 <= x - self.camera[0] < self.width // TILESIZE \
+            and 0 <= y - self.camera[1] < self.height // TILESIZE
+
+    def _tile_rect(self, x: int, y: int) -> pygame.Rect:
+        """
+        Return the area of the window the tile at (x, y) is drawn on.
+        """
+        return pygame.Rect((x - self.camera[0]) * TILESIZE,
+                           (y - self.camera[1]) * TILESIZE, TILESIZE,
+                           TILESIZE)
 
-        # Blit the player at the end to make it above all other objects
-        if self.player:
-            rect = pygame.Rect(self.player.x * TILESIZE,
-                               self.player.y * TILESIZE, TILESIZE, TILESIZE)
+    def _draw_tile(self, x: int, y: int, rect: pygame.Rect) -> None:
+        """
+        Draw the background and the actors of the tile at (x, y) onto <rect>
+        of the screen.
+        """
+        bg_x, bg_y = self._background_pos()
+        self.screen.blit(self.background, rect, rect.move(-bg_x, -bg_y))
+        for actor_ in self._grid.get_all(x, y):
+            self.screen.blit(actor_.image, rect)
+        if self.player and (self.player.x, self.player.y) == (x, y):
             self.screen.blit(self.player.image, rect)
 
-        pygame.display.flip()
+    def _background_pos(self) -> Tuple[int, int]:
+        """
+        Return where the background is drawn so that it is centred on the
+        screen.
+        """
+        return (int((0.5 * self.width) - (0.5 * 1920)),
+                int((0.5 * self.height) - (0.5 * 1080)))
 
     def _events(self) -> None:
         """
         Event handling of the game window
         """
         for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                self._running = False
-            # Allows us to make each press count as 1 movement.
-            elif event.type == pygame.KEYDOWN:
-                self.keys_pressed = pygame.key.get_pressed()
-                ctrl_held = self.keys_pressed[pygame.K_LCTRL]
-
-                # handle undo button and player movement here
-                if event.key == pygame.K_z and ctrl_held:  # Ctrl-Z
-                    self._undo()
-                else:
-                    if self.player is not None:
-                        assert isinstance(self.player, actor.Character)
-                        save = self._copy()
-                        if self.player.player_move(self) \
-                                and not self.win_or_lose():
-                            self._history.push(save)
+            self._handle_event(event)
         return
 
+    def _handle_event(self, event: pygame.event.Event) -> None:
+        """
+        Handle a single event of the game window
+        """
+        if event.type == pygame.QUIT:
+            self._running = False
+        elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+            self._full_redraw = True
+        # Allows us to make each press count as 1 movement.
+        elif event.type == pygame.KEYDOWN:
+            self.keys_pressed = pygame.key.get_pressed()
+            ctrl_held = self.keys_pressed[pygame.K_LCTRL]
+
+            # handle undo button and player movement here
+            if event.key == pygame.K_z and ctrl_held:  # Ctrl-Z
+                self._undo()
+            else:
+                self._play_move()
+
+    def step(self, dx: int, dy: int) -> bool:
+        """
+        Play one move of the player by (dx, dy), as pressing the matching
+        arrow key would, then update the rules as the next frame would.
+        This is how a headless game is played.
+
+        The move and the rule update are a single transaction (see
+        _play_move).
+
+        Returns whether the player actually moved.
+        """
+        return self._play_move((dx, dy), update=True)
+
+    def _play_move(self, direction: Optional[Tuple[int, int]] = None,
+                   update: bool = False) -> bool:
+        """
+        Move the player by <direction>, or as directed by keys_pressed if it
+        is None, then update the rules if <update>.
+
+        A move is a transaction. Whether it is blocked is checked first (see
+        Actor.push_line), so a blocked move changes nothing but the way the
+        player faces. A move that happens logs every change it makes into a
+        new Delta as it is made. If it does not end the game, the Delta is
+        committed as its own entry in _history, which goes on recording
+        changes until the next move; if it does, it is folded into the entry
+        before it (see _close_move). Should anything fail on the way, the
+        changes logged so far are rolled back (see _rollback).
+
+        Returns whether the player actually moved.
+        """
+        player = self.player
+        if player is not None and direction is None:
+            direction = player.handle_key_press(self)
+        line = None
+        if player is not None and direction != (0, 0):
+            line = player.push_line(self, *direction)
+        if line is None:
+            if player is not None:
+                self._record(player)
+                player.turn(*direction)
+            if update:
+                self._update()
+            return False
+
+        assert isinstance(player, actor.Character)
+        self._delta = Delta(self._rules, player, self._running,
+                            self._outcome)
+        self._record(player)
+        try:
+            player.player_move_by(self, *direction)
+            ended = self.win_or_lose()
+            if self.replay is not None:
+                self.replay.record_move(self, direction, not ended)
+            if update:
+                self._update()
+        except BaseException:
+            self._rollback()
+            raise
+        if self.profiler is not None:
+            self.profiler.record_move(len(line) - 1)
+        if ended:
+            self._close_move()
+        else:
+            self._history.push(self._delta)
+        if self.save_path is not None:
+            self._unsaved += 1
+            if self._unsaved >= AUTOSAVE_EVERY:
+                self.save(self.save_path, history=True)
+        return True
+
+    def _close_move(self) -> None:
+        """
+        Deal with the changes of a move that does not get its own history
+        entry: fold them into the entry on top of _history, so that undoing
+        that entry also reverts them, and keep recording into it.
+        """
+        if not self._history.is_empty() \
+                and isinstance(self._history.peek(), Delta):
+            self._history.peek().merge(self._delta)
+        self._reopen()
+
+    def _rollback(self) -> None:
+        """
+        Revert the changes logged by the move being made, which has no
+        history entry yet, and keep recording into the entry on top of
+        _history.
+
+        The rules read off the "Is" tiles checked during the move may not
+        have been applied, so they are forgotten and read again by the next
+        update.
+        """
+        delta = self._delta
+        self._revert(delta)
+        for ac, (x, y, state) in delta.get_actor_states():
+            if isinstance(ac, actor.Is):
+                self._is_rules.pop(ac, None)
+                self._dirty_cells.add((x, y))
+        self._reopen()
+
+    def _reopen(self) -> None:
+        """
+        Record the changes made from now on into the entry on top of
+        _history, if it is a Delta.
+        """
+        if not self._history.is_empty() \
+                and isinstance(self._history.peek(), Delta):
+            self._delta = self._history.peek()
+        else:
+            self._delta = None
+
     def win_or_lose(self) -> bool:
         """
         Check if the game has won or lost
         Returns True if the game is won or lost; otherwise return False
         """
         assert isinstance(self.player, actor.Character)
-        for ac in self._actors:
-            if isinstance(ac, actor.Character) \
-                    and ac.x == self.player.x and ac.y == self.player.y:
+        for ac in list(self._grid.get_all(self.player.x, self.player.y)):
+            if isinstance(ac, actor.Character):
                 if ac.is_win():
                     self.win()
                     return True
@@ -178,15 +766,110 @@ class Game:
                     return True
         return False
 
-    def run(self) -> None:
+    def preview_move(self, dx: int, dy: int) -> MovePreview:
+        """
+        Return what moving the player by (dx, dy) would do, without changing
+        the game: whether the player would move, the actors that would
+        shift, and whether the game would be won or lost, as step would
+        find before the rules are updated.
+        """
+        preview = MovePreview((dx, dy))
+        if self.player is None or (dx == 0 and dy == 0):
+            return preview
+        line = self.player.push_line(self, dx, dy)
+        if line is None:
+            return preview
+        preview.moved = True
+        preview.shifted = line
+        # Only the player enters its new cell; the actor it pushes, if any,
+        # leaves it. win_or_lose looks at the cell's actors in rank order.
+        x, y = self.player.x + dx, self.player.y + dy
+        here = [ac for ac in self._grid.get_all(x, y)
+                if len(line) == 1 or ac is not line[1]]
+        here.append(self.player)
+        here.sort(key=self._grid.get_rank)
+        for ac in here:
+            if isinstance(ac, actor.Character):
+                if ac.is_win():
+                    preview.outcome = "win"
+                    break
+                elif ac.is_lose():
+                    preview.outcome = "lose"
+                    break
+        return preview
+
+    def legal_moves(self) -> List[MovePreview]:
+        """
+        Return the previews of the moves in all DIRECTIONS (see
+        preview_move), whether the player would move or not.
+        """
+        return [self.preview_move(dx, dy) for dx, dy in DIRECTIONS]
+
+    def run(self, wait_for_events: bool = WAIT_FOR_EVENTS) -> None:
         """
         Run the Game until it ends or player quits.
+
+        If <wait_for_events>, the game sleeps until the window gets an event
+        instead of checking for events FPS times a second, and only updates
+        and draws after one. A keypress is then handled as soon as it
+        arrives, and an idle game uses no CPU.
+
+        When the game ends, the records of its profiler, if any, are written
+        out, including those of the frames since the last periodic write.
+        """
+        try:
+            if wait_for_events:
+                self._run_on_events()
+                return
+            while self._running:
+                pygame.time.wait(1000 // FPS)
+                self._frame()
+        finally:
+            if self.profiler is not None:
+                self.profiler.write()
+
+    def _run_on_events(self) -> None:
         """
+        Run the Game until it ends or player quits, blocking on the event
+        queue between frames.
+
+        Nothing in the game animates on its own (Meepo's walking frames
+        change on a keypress), so no frame clock is needed: a frame is made
+        for every batch of events, and _draw presents nothing when no tile
+        changed.
+        """
+        pygame.event.set_allowed(None)
+        pygame.event.set_blocked([pygame.MOUSEMOTION, pygame.KEYUP])
+        self._frame()
         while self._running:
-            pygame.time.wait(1000 // FPS)
+            self._frame(pygame.event.wait())
+
+    def _frame(self, event: Optional[pygame.event.Event] = None) -> None:
+        """
+        Make one frame: handle <event>, if given, and the events waiting in
+        the queue, then update the rules and draw the screen.
+
+        If there is a profiler, the time spent in each of the three phases
+        is recorded into it.
+        """
+        profiler = self.profiler
+        if profiler is None:
+            if event is not None:
+                self._handle_event(event)
             self._events()
             self._update()
             self._draw()
+            return
+        profiler.start_frame()
+        with profiler.phase("events"):
+            if event is not None:
+                self._handle_event(event)
+            self._events()
+        with profiler.phase("update"):
+            self._update()
+        with profiler.phase("draw"):
+            self._draw()
+        profiler.end_frame(self._history.size(), self._history.get_size())
 
     def set_player(self, actor_: Optional[actor.Actor]) -> None:
         """
@@ -198,32 +881,86 @@ class Game:
         """
         Remove the given <actor> from the game's list of actors.
         """
+        if self._delta is not None:
+            self._delta.record_removal(self._actors.index(actor_), actor_)
+        self._hash ^= self._actor_key(actor_)
         self._actors.remove(actor_)
+        self._grid.remove(actor_)
+        self._by_type[type(actor_)].remove(actor_)
+        self._dirty_cells.add((actor_.x, actor_.y))
+        self._dirty_tiles.add((actor_.x, actor_.y))
+        actor_.set_game(None)
         self.player = None
 
     def _update(self) -> None:
         """
         Check each "Is" tile to find what rules are added and which are removed
         if any, and handle them accordingly.
+
+        Only the "Is" tiles next to (or on) a cell whose actors changed since
+        the last update are checked again; the rules read off the others are
+        remembered in _is_rules. If nothing changed, nothing is done.
+
+        A recording game logs the update (see Replay.record_frame).
+        """
+        if self._dirty_cells:
+            self._update_rules()
+        if self.replay is not None:
+            self.replay.record_frame(self)
+
+    def _update_rules(self) -> None:
+        """
+        Read the rules off the "Is" tiles next to (or on) the cells that
+        changed since the last update, and apply the rules added and removed.
         """
+        changed = False
+        for is_block in self._dirty_is_blocks():
+            self._record(is_block)
+            up, down, left, right = self.get_surround_ac(is_block)
+            found = is_block.update(up, down, left, right)
+            if self._is_rules.get(is_block) != found:
+                self._is_rules[is_block] = found
+                changed = True
+        self._dirty_cells = set()
+        if not changed:
+            return
+
         new_rules = []
         for is_block in self._is:
-            up, down, left, right = self.get_surround_ac(is_block)
-            horizontal, vertical = is_block.update(up, down, left, right)
-            for rule in [horizontal, vertical]:
+            for rule in self._is_rules.get(is_block, ("", "")):
                 if rule and new_rules.count(rule) == 0:
                     new_rules.append(rule)
 
         for rule in self._rules:
             if rule not in new_rules:
                 self.apply_removal_rule(rule)
+                self._hash ^= zobrist_key("rule", rule)
+                if self.profiler is not None:
+                    self.profiler.count("rules_removed")
 
         for rule in new_rules:
             if rule not in self._rules:
                 self.apply_additional_rule(rule)
+                self._hash ^= zobrist_key("rule", rule)
+                if self.profiler is not None:
+                    self.profiler.count("rules_added")
 
         self._rules = new_rules
 
+    def _dirty_is_blocks(self) -> Set[actor.Is]:
+        """
+        Return the "Is" tiles on or next to a cell that changed since the last
+        update.
+        """
+        is_blocks = set()
+        for x, y in self._dirty_cells:
+            for cell in [(x, y), (x, y - 1), (x, y + 1), (x - 1, y),
+                         (x + 1, y)]:
+                for ac in self._grid.get_all(*cell):
+                    if isinstance(ac, actor.Is):
+                        is_blocks.add(ac)
+        return is_blocks
+
     @staticmethod
     def get_character(subject: str) -> Optional[Type[Any]]:
         """
@@ -245,69 +982,279 @@ class Game:
         """
         Returns the game to a previous state based on what is at the top of the
         _history stack.
+
+        History entries are normally Deltas, which are reverted in place, but
+        may also be whole copies of a game made by _copy.
         """
-        if not self._history.is_empty():
-            game_copy = self._history.pop()
-            self._actors = game_copy.get_actors()
-            self._is = []
-            for is_is in self._actors:
-                if isinstance(is_is, actor.Is):
-                    self._is.append(is_is)
-            self._rules = game_copy.get_rules()
-            self._running = game_copy.get_running()
-            self.player = game_copy.player
-            self.map_data = game_copy.map_data
-            self.keys_pressed = game_copy.keys_pressed
-            old_player = self.player
-            self.player = None
-            for ac in self._actors:
-                if isinstance(ac, type(old_player)):
-                    self.player = ac
-                    break
-            assert isinstance(self.player, actor.Character)
-        return
+        if self._history.is_empty():
+            return
+        entry = self._history.pop()
+        if isinstance(entry, Delta):
+            self._revert(entry)
+        else:
+            self._restore(entry)
+        self._reopen()
+        if self.replay is not None:
+            self.replay.record_undo(self)
+
+    def _revert(self, delta: Delta) -> None:
+        """
+        Revert every change recorded in <delta>.
+        """
+        self._delta = None
+        for index, ac in reversed(delta.get_removed()):
+            self._actors.insert(index, ac)
+            ac.set_game(self)
+            self._grid.add(ac)
+            self._add_to_types(ac)
+            self._dirty_cells.add((ac.x, ac.y))
+            self._dirty_tiles.add((ac.x, ac.y))
+            self._hash ^= self._actor_key(ac)
+        for ac, (x, y, state) in delta.get_actor_states():
+            ac.set_state(state)
+            ac.x, ac.y = x, y
+        for properties, state in delta.get_property_states():
+            type_ = self._type_of(properties)
+            self._hash ^= self._properties_key(type_, properties)
+            properties.set_state(state)
+            self._hash ^= self._properties_key(type_, properties)
+        for rule in set(self._rules) ^ set(delta.rules):
+            self._hash ^= zobrist_key("rule", rule)
+        self._rules = delta.rules
+        self.player = delta.player
+        self._running = delta.running
+        self._outcome = delta.outcome
+
+    def _restore(self, game_copy: 'Game') -> None:
+        """
+        Replace the state of this game with that of <game_copy>, a copy made
+        by _copy.
+        """
+        for ac in self._actors:
+            ac.set_game(None)
+        self._actors = game_copy.get_actors()
+        self._properties = game_copy._properties
+        self._index_actors()
+        self._is = []
+        for is_is in self._actors:
+            if isinstance(is_is, actor.Is):
+                self._is.append(is_is)
+        self._rules = game_copy.get_rules()
+        self._running = game_copy.get_running()
+        self._outcome = game_copy.get_outcome()
+        self.player = game_copy.player
+        self._compiled = game_copy._compiled
+        self._map_data = game_copy._map_data
+        self.keys_pressed = game_copy.keys_pressed
+        self._hash = self._full_hash()
+        old_player = self.player
+        self.player = None
+        for ac in self._actors:
+            if isinstance(ac, type(old_player)):
+                self.player = ac
+                break
+        assert isinstance(self.player, actor.Character)
 
     def _copy(self) -> 'Game':
         """
         Copies relevant attributes of the game onto a new instance of Game.
         Return new instance of game
         """
-        game_copy = Game()
+        game_copy = Game(self.headless)
+        for type_, properties in self._properties.items():
+            game_copy._properties[type_] = properties.copy()
         for ac in self._actors:
-            game_copy._actors.append(ac.copy())
-        for is_block in self._is:
-            game_copy._is.append(is_block.copy())
+            ac_copy = ac.copy()
+            game_copy._actors.append(ac_copy)
+            if isinstance(ac_copy, actor.Is):
+                game_copy._is.append(ac_copy)
+            if ac is self.player:
+                game_copy.player = ac_copy
+        game_copy._index_actors()
         for rule in self._rules:
             game_copy._rules.append(rule[:])
+        game_copy._hash = self._hash
         game_copy._running = self._running
-        game_copy.player = self.player.copy()
-        game_copy.map_data = self.map_data
+        game_copy._outcome = self._outcome
+        game_copy._compiled = self._compiled
+        game_copy._map_data = self._map_data
         game_copy.keys_pressed = self.keys_pressed
+        history = self._history
+        game_copy.set_history_budget(history.max_entries, history.max_bytes,
+                                     history.policy, history.pack_after)
 
         return game_copy
 
+    def start_recording(self, every: int = KEYFRAME_EVERY) -> None:
+        """
+        Start recording the moves, undos and rule updates of this game into
+        a new Replay, from its current state, keeping a keyframe every
+        <every> entries. The recording cannot go back past its start, so the
+        undo history is cleared.
+        """
+        from replay import Replay
+        self._history.clear()
+        self._delta = None
+        self.replay = Replay(self, every)
+        self._history.merged = self.replay.history_merged
+
+    def seek(self, index: int) -> 'Game':
+        """
+        Return a new headless game in the state this game was in after the
+        first <index> entries of its recording, replayed from the nearest
+        keyframe (see Replay.seek).
+        """
+        assert self.replay is not None
+        return self.replay.seek(index)
+
+    def save(self, path: str, history: bool = False) -> None:
+        """
+        Save this game to the file at <path> (see savegame.py), with its
+        undo history if <history>, so that restore can take it back to this
+        state later, in this run or another.
+
+        Raise a ValueError if <history> and the undo history holds an entry
+        that is not a Delta, like a copy of a game (see _restore).
+        """
+        saved = savegame.SavedGame()
+        saved.x_tiles, saved.y_tiles = self.x_tiles, self.y_tiles
+        alive = set(self._actors)
+        sprite_ids = {}
+        tiles = bytearray()
+        for ac in self._ranked:
+            tiles.append(ord(self._tile(ac)))
+            saved.sprite_ids.append(
+                sprite_ids.setdefault(ac.sprite, len(sprite_ids)))
+            saved.xs.append(ac.x)
+            saved.ys.append(ac.y)
+        saved.tiles = bytes(tiles)
+        saved.alive = bytes(ac in alive for ac in self._ranked)
+        saved.sprites = list(sprite_ids)
+        saved.player = -1 if self.player is None \
+            else self._grid.get_rank(self.player)
+        saved.rules = list(self._rules)
+        saved.running = self._running
+        saved.outcome = self._outcome
+        saved.properties = {type_.__name__: properties.get_flags()
+                            for type_, properties in self._properties.items()}
+        if history:
+            for entry in self.get_history():
+                if isinstance(entry, Delta):
+                    entry = self._pack(entry)
+                elif not isinstance(entry, PackedDelta):
+                    raise ValueError("cannot save a history entry of type "
+                                     + type(entry).__name__)
+                saved.history.append(entry.data)
+            saved.spans.extend(self._history.get_spans())
+            saved.values = self._history.get_values()
+        savegame.save(saved, path)
+        self._unsaved = 0
+
+    def restore(self, path: str) -> None:
+        """
+        Replace the state of this game with the one saved to the file at
+        <path> by save, along with its undo history if it was saved. The
+        recording, if any, stops, and map_data becomes the map of the actors
+        in the game.
+
+        Raise a ValueError if the file is not a saved game, leaving this game
+        unchanged.
+        """
+        saved = savegame.load(path)
+        tiles = saved.tiles.decode()
+        if any(tile not in _CONSTRUCTORS for tile in tiles) \
+                or not -1 <= saved.player < len(tiles) \
+                or any(sprite_id >= len(saved.sprites)
+                       for sprite_id in saved.sprite_ids) \
+                or any(self.get_character(name) is None
+                       for name in saved.properties):
+            raise ValueError("not a saved game")
+        # The actors keep their positions as saved, even those that have
+        # left the map, which only map_data leaves out.
+        alive = [i for i, in_game in enumerate(saved.alive) if in_game]
+        compiled = mapcache.CompiledMap(
+            saved.x_tiles, saved.y_tiles,
+            bytes(saved.tiles[i] for i in alive),
+            array("i", [saved.xs[i] for i in alive]),
+            array("i", [saved.ys[i] for i in alive]))
+        self._set_size(saved.x_tiles, saved.y_tiles)
+        self._compiled = compiled
+        self._map_data = None
+        if not self.headless:
+            self._open_window()
+        for ac in self._actors:
+            ac.set_game(None)
+        self._actors = []
+        self._is = []
+        self._properties = {}
+        self._history.clear()
+        self._history.merged = None
+        self._delta = None
+        self.replay = None
+        self.camera = (0, 0)
+        self._drawn_player = None
+        for name, flags in saved.properties.items():
+            self.get_properties(self.get_character(name)).set_flags(flags)
+        for tile, x, y, sprite_id in zip(tiles, saved.xs, saved.ys,
+                                         saved.sprite_ids):
+            self._add_tile(tile, x, y)
+            self._actors[-1].sprite = saved.sprites[sprite_id]
+        # Every actor gets its rank, then the ones no longer in the game are
+        # taken out, as remove_player would.
+        self._index_actors()
+        for ac, alive in zip(self._ranked, saved.alive):
+            if not alive:
+                self._actors.remove(ac)
+                self._grid.remove(ac)
+                self._by_type[type(ac)].remove(ac)
+                ac.set_game(None)
+        self._rules = saved.rules
+        self._running = saved.running
+        self._outcome = saved.outcome
+        self.player = None if saved.player < 0 \
+            else self._ranked[saved.player]
+        self._hash = self._full_hash()
+        if saved.history:
+            self._history.restore([PackedDelta(data)
+                                   for data in saved.history],
+                                  list(saved.spans), saved.values)
+            self._reopen()
+
+    @staticmethod
+    def _tile(actor_: actor.Actor) -> str:
+        """
+        Return the map character of <actor_>, as read by _add_tile.
+        """
+        if isinstance(actor_, actor.Is):
+            return "I"
+        return _TILES[Game._kind(actor_)]
+
     def get_actor(self, x: int, y: int) -> Optional[actor.Actor]:
         """
         Return the actor at the position x,y. If the slot is empty, Return None
+        If several actors share the slot, return the first of them in _actors.
         """
-        for ac in self._actors:
-            if ac.x == x and ac.y == y:
-                return ac
-        return None
+        if self.profiler is not None:
+            self.profiler.count("get_actor")
+        return self._grid.get(x, y)
 
     def win(self) -> None:
         """
         End the game and print win message.
         """
         self._running = False
-        print("Congratulations, you won!")
+        self._outcome = "win"
+        if not self.headless:
+            print("Congratulations, you won!")
 
     def lose(self, char: actor.Character) -> None:
         """
         Lose the game and print lose message
         """
         self.remove_player(char)
-        print("You lost! But you can have it undone if undo is done :)")
+        self._outcome = "lose"
+        if not self.headless:
+            print("You lost! But you can have it undone if undo is done :)")
 
     def get_surround_ac(self, curr_actor: actor.Actor) -> List:
         """
@@ -320,52 +1267,117 @@ class Game:
         right = self.get_actor(curr_actor.x + 1, curr_actor.y)
         return [up, down, left, right]
 
+    @staticmethod
+    def parse_rule(rule: str) -> Tuple[Optional[Type[Any]], str]:
+        """
+        Return the class of the characters <rule> applies to and the
+        attribute it gives them, e.g. (actor.Wall, "Push") for
+        "Wall isPush". Each rule is only parsed the first time.
+        """
+        parsed = _PARSED_RULES.get(rule)
+        if parsed is None:
+            subject, attribute = rule.split()
+            parsed = (Game.get_character(subject), attribute[2:])
+            _PARSED_RULES[rule] = parsed
+        return parsed
+
+    def _change_properties(self, type_: Type[actor.Character]) \
+            -> actor.Properties:
+        """
+        Return the properties of the characters of class <type_>, which are
+        about to change: record them for undo, and take them out of the
+        hash until _changed_properties puts them back.
+        """
+        properties = self.get_properties(type_)
+        if self._delta is not None:
+            self._delta.record_properties(properties)
+        self._hash ^= self._properties_key(type_, properties)
+        return properties
+
+    def _changed_properties(self, type_: Type[actor.Character]) -> None:
+        """
+        Put the properties of the characters of class <type_> back in the
+        hash after a change.
+        """
+        self._hash ^= self._properties_key(type_, self.get_properties(type_))
+
+    def _type_of(self, properties: actor.Properties) \
+            -> Type[actor.Character]:
+        """
+        Return the class of the characters that have <properties>.
+        """
+        for type_, others in self._properties.items():
+            if others is properties:
+                return type_
+        raise ValueError("properties not in this game")
+
     def apply_removal_rule(self, rule) -> None:
         """
         Remove the given rule from the game.
+
+        The rule is removed from the properties shared by the characters it
+        applies to, so this takes the same time however many there are.
         """
-        subject, attribute = rule.split()
-        for ac in self.get_actors():
-            if isinstance(ac, self.get_character(subject)):
-                if attribute[2:] == ATTRIBUTES["P"]:
-                    ac.unset_push()
-                elif attribute[2:] == ATTRIBUTES["S"]:
-                    ac.unset_stop()
-                elif attribute[2:] == ATTRIBUTES["V"]:
-                    ac.unset_win()
-                elif attribute[2:] == ATTRIBUTES["L"]:
-                    ac.unset_lose()
-                elif attribute[2:] == ATTRIBUTES["Y"]:
-                    if ac.is_player():
-                        ac.unset_player()
-                        self.player = None
+        character, attribute = self.parse_rule(rule)
+        if character is None:
+            return
+        properties = self._change_properties(character)
+        if attribute == ATTRIBUTES["P"]:
+            properties.push = False
+        elif attribute == ATTRIBUTES["S"]:
+            properties.stop = False
+        elif attribute == ATTRIBUTES["V"]:
+            properties.win = False
+        elif attribute == ATTRIBUTES["L"]:
+            properties.lose = False
+        elif attribute == ATTRIBUTES["Y"]:
+            if properties.player and self.get_actors_of_type(character):
+                self.player = None
+            properties.player = False
+        self._changed_properties(character)
 
     def apply_additional_rule(self, rule) -> None:
         """
         Apply the given rules to the game.
+
+        The rule is added to the properties shared by the characters it
+        applies to, so this takes the same time however many there are.
         """
-        subject, attribute = rule.split()
-        for ac in self.get_actors():
-            if isinstance(ac, self.get_character(subject)):
-                if attribute[2:] == ATTRIBUTES["P"]:
-                    ac.set_push()
-                elif attribute[2:] == ATTRIBUTES["S"]:
-                    ac.set_stop()
-                elif attribute[2:] == ATTRIBUTES["V"]:
-                    ac.set_win()
-                elif attribute[2:] == ATTRIBUTES["L"]:
-                    ac.set_lose()
-                elif attribute[2:] == ATTRIBUTES["Y"]:
-                    ac.set_player()
-                    self.set_player(ac)
+        character, attribute = self.parse_rule(rule)
+        if character is None:
+            return
+        properties = self._change_properties(character)
+        if attribute == ATTRIBUTES["P"]:
+            properties.set_push()
+        elif attribute == ATTRIBUTES["S"]:
+            properties.set_stop()
+        elif attribute == ATTRIBUTES["V"]:
+            properties.set_win()
+        elif attribute == ATTRIBUTES["L"]:
+            properties.set_lose()
+        elif attribute == ATTRIBUTES["Y"]:
+            properties.set_player()
+            characters = self.get_actors_of_type(character)
+            if characters:
+                self.set_player(characters[-1])
+        self._changed_properties(character)
 
 
 if __name__ == "__main__":
     game = Game()
-    # load_map public function
-    game.load_map(MAP_PATH)
-    game.new()
+    if SAVE_PATH is not None and os.path.exists(SAVE_PATH):
+        game.restore(SAVE_PATH)
+    else:
+        # load_map public function
+        game.load_map(MAP_PATH)
+        game.new()
+    game.save_path = SAVE_PATH
+    if PROFILE_PATH is not None:
+        from profiler import FrameProfiler
+        game.profiler = FrameProfiler(PROFILE_PATH)
     game.run()
+    if SAVE_PATH is not None:
+        game.save(SAVE_PATH, history=True)
 
     # import python_ta
     # python_ta.check_all(config={
@@ -0,0 +1,99 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class Grid:
+    """A spatial index of the actors in a game, keyed by their (x, y) cell.
+
+    Several actors may share a cell (e.g. the player standing on a flag). The
+    actors of a cell are kept in the order they were first added to the grid,
+    which is the order of the game's list of actors, so that looking up a cell
+    gives the same answer as scanning that list from the front.
+    """
+    # === Private Attributes ===
+    # _cells:
+    #     Maps each occupied (x, y) cell to the actors in it, in rank order.
+    #     Empty cells are not stored.
+    # _ranks:
+    #     Maps each actor ever added to this grid to its rank, i.e. the order
+    #     in which it was first added. A removed actor keeps its rank so that
+    #     adding it back puts it where it was.
+    _cells: Dict[Tuple[int, int], List[Any]]
+    _ranks: Dict[Any, int]
+
+    def __init__(self) -> None:
+        """Initialize a new empty grid."""
+        self._cells = {}
+        self._ranks = {}
+
+    def clear(self) -> None:
+        """Remove every actor from this grid and forget their ranks."""
+        self._cells = {}
+        self._ranks = {}
+
+    def add(self, actor_: Any) -> None:
+        """Add <actor_> to the cell at its current position."""
+        rank = self._ranks.setdefault(actor_, len(self._ranks))
+        cell = self._cells.setdefault((actor_.x, actor_.y), [])
+        i = len(cell)
+        while i > 0 and self._ranks[cell[i - 1]] > rank:
+            i -= 1
+        cell.insert(i, actor_)
+
+    def remove(self, actor_: Any, x: Optional[int] = None,
+               y: Optional[int] = None) -> None:
+        """Remove <actor_> from the cell at (x, y).
+
+        The cell defaults to the actor's current position.
+        """
+        if x is None:
+            x, y = actor_.x, actor_.y
+        cell = self._cells[(x, y)]
+        cell.remove(actor_)
+        if not cell:
+            del self._cells[(x, y)]
+
+    def get_rank(self, actor_: Any) -> int:
+        """Return the rank of <actor_>, which must have been added to this
+        grid: the number of actors first added before it.
+        """
+        return self._ranks[actor_]
+
+    def move(self, actor_: Any, old_x: int, old_y: int) -> None:
+        """Move <actor_> from the cell at (old_x, old_y) to the cell at its
+        current position.
+        """
+        self.remove(actor_, old_x, old_y)
+        self.add(actor_)
+
+    def get(self, x: int, y: int) -> Optional[Any]:
+        """Return the first actor at (x, y), or None if the cell is empty.
+
+        >>> g = Grid()
+        >>> g.get(1, 2) is None
+        True
+        """
+        cell = self._cells.get((x, y))
+        if cell:
+            return cell[0]
+        return None
+
+    def get_all(self, x: int, y: int) -> List[Any]:
+        """Return all the actors at (x, y), in rank order."""
+        return self._cells.get((x, y), [])
+
+    def get_area(self, x: int, y: int, width: int,
+                 height: int) -> List[Any]:
+        """Return all the actors in the <width> by <height> cells whose top
+        left cell is (x, y), cell by cell, in rank order within each cell.
+
+        Only the cells of the area are looked at, so this takes time in
+        proportion to its size, however many actors are outside it.
+        """
+        actors = []
+        cells = self._cells
+        for cell_y in range(y, y + height):
+            for cell_x in range(x, x + width):
+                cell = cells.get((cell_x, cell_y))
+                if cell:
+                    actors.extend(cell)
+        return actors
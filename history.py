@@ -0,0 +1,508 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import sys
+from array import array
+from stack import Stack
+
+
+class Delta:
+    """The changes made to a game since a point in its history.
+
+    Rather than a copy of the whole game, a Delta holds only the values that
+    were replaced: for every actor that changed, its position and state as
+    they were at that point, for every type whose properties changed, those
+    properties, plus the rules, the player, whether the game was running and
+    whether it had been won or lost. Reverting these values
+    (see Game._undo) brings the game back to that point.
+
+    === Public Attributes ===
+    rules:
+        The rules in effect at that point
+    player:
+        The player at that point
+    running:
+        Whether the game was running at that point
+    outcome:
+        "win", "lose" or None, as returned by Game.get_outcome at that point
+    """
+    # === Private Attributes ===
+    # _actors:
+    #     Maps each actor changed since that point to its (x, y, state) at
+    #     that point, where state is the value of Actor.get_state().
+    # _removed:
+    #     The (index, actor) pairs of the actors removed from the game's list
+    #     of actors since that point, in the order they were removed.
+    # _properties:
+    #     Maps the Properties of each type changed since that point to their
+    #     state at that point, as returned by Properties.get_state().
+    __slots__ = ("rules", "player", "running", "outcome", "_actors",
+                 "_removed", "_properties")
+    rules: List[str]
+    player: Optional[Any]
+    running: bool
+    outcome: Optional[str]
+    _actors: Dict[Any, Tuple[int, int, tuple]]
+    _removed: List[Tuple[int, Any]]
+    _properties: Dict[Any, tuple]
+
+    def __init__(self, rules: List[str], player: Optional[Any],
+                 running: bool, outcome: Optional[str] = None) -> None:
+        """Initialize a new Delta recording no changes yet."""
+        self.rules = rules
+        self.player = player
+        self.running = running
+        self.outcome = outcome
+        self._actors = {}
+        self._removed = []
+        self._properties = {}
+
+    def __len__(self) -> int:
+        """Return the number of actors changed in this Delta."""
+        return len(self._actors)
+
+    def record(self, actor_: Any, x: int, y: int) -> None:
+        """Record that <actor_> is about to change, where (x, y) is its
+        position before the change.
+
+        Only the first change of each actor is recorded, since that holds the
+        values to revert to.
+        """
+        if actor_ not in self._actors:
+            self._actors[actor_] = (x, y, actor_.get_state())
+
+    def record_properties(self, properties: Any) -> None:
+        """Record that <properties>, the Properties of a type of actor, are
+        about to change.
+        """
+        if properties not in self._properties:
+            self._properties[properties] = properties.get_state()
+
+    def record_removal(self, index: int, actor_: Any) -> None:
+        """Record that <actor_> was removed from index <index> of the game's
+        list of actors.
+        """
+        self._removed.append((index, actor_))
+
+    def get_actor_states(self) -> List[Tuple[Any, Tuple[int, int, tuple]]]:
+        """Return (actor, (x, y, state)) for every changed actor."""
+        return list(self._actors.items())
+
+    def get_property_states(self) -> List[Tuple[Any, tuple]]:
+        """Return (properties, state) for every changed Properties."""
+        return list(self._properties.items())
+
+    def get_removed(self) -> List[Tuple[int, Any]]:
+        """Return the (index, actor) pairs of the removed actors, in the order
+        they were removed.
+        """
+        return self._removed
+
+    def merge(self, later: 'Delta') -> None:
+        """Add the changes recorded by <later>, a Delta started after this
+        one, so that reverting this Delta also reverts them.
+        """
+        for actor_, values in later.get_actor_states():
+            if actor_ not in self._actors:
+                self._actors[actor_] = values
+        for properties, state in later.get_property_states():
+            if properties not in self._properties:
+                self._properties[properties] = state
+        self._removed.extend(later.get_removed())
+
+    def get_size(self) -> int:
+        """Return about how many bytes this Delta takes on its own, not
+        counting the actors, rules and sprites it refers to, which belong to
+        the game.
+        """
+        size = sys.getsizeof(self) + sys.getsizeof(self._actors) \
+            + sys.getsizeof(self._removed) + sys.getsizeof(self._properties)
+        for values in self._actors.values():
+            size += sys.getsizeof(values) + sys.getsizeof(values[2])
+        for state in self._properties.values():
+            size += sys.getsizeof(state)
+        for removal in self._removed:
+            size += sys.getsizeof(removal)
+        return size
+
+    def pack(self, actor_id: Callable[[Any], int],
+             properties_id: Callable[[Any], str],
+             value_id: Callable[[Any], int]) -> 'PackedDelta':
+        """Return this Delta packed into bytes, where each actor is replaced
+        by <actor_id> of it, each Properties by <properties_id> of them, and
+        every other value (the rules, the states, the outcome...) by
+        <value_id> of it, a number standing for that value.
+        """
+        numbers = array("i", [
+            -1 if self.player is None else actor_id(self.player),
+            value_id(tuple(self.rules)), self.running,
+            value_id(self.outcome), len(self._actors), len(self._removed),
+            len(self._properties)])
+        for ac, (x, y, state) in self._actors.items():
+            numbers.extend([actor_id(ac), x, y, value_id(state)])
+        for index, ac in self._removed:
+            numbers.extend([index, actor_id(ac)])
+        for properties, state in self._properties.items():
+            numbers.extend([value_id(properties_id(properties)),
+                            value_id(state)])
+        return PackedDelta(numbers.tobytes())
+
+
+class PackedDelta:
+    """A Delta packed into bytes by Delta.pack, to take less memory while it
+    waits deep in the undo history. The bytes are an array of 32-bit
+    integers, in the machine's byte order.
+
+    === Public Attributes ===
+    data:
+        The packed Delta
+    """
+    __slots__ = ("data",)
+    data: bytes
+
+    def __init__(self, data: bytes) -> None:
+        """Initialize a PackedDelta of <data>."""
+        self.data = data
+
+    def get_size(self) -> int:
+        """Return how many bytes this PackedDelta takes."""
+        return sys.getsizeof(self) + sys.getsizeof(self.data)
+
+    def unpack(self, actor_of: Callable[[int], Any],
+               properties_of: Callable[[str], Any],
+               value_of: Callable[[int], Any]) -> Delta:
+        """Return the Delta packed into this, where <actor_of>,
+        <properties_of> and <value_of> undo the actor_id, properties_id and
+        value_id it was packed with.
+        """
+        numbers = array("i")
+        numbers.frombytes(self.data)
+        player, rules, running, outcome, actors, removed, properties = \
+            numbers[:7]
+        delta = Delta(list(value_of(rules)),
+                      None if player < 0 else actor_of(player),
+                      bool(running), value_of(outcome))
+        i = 7
+        for _ in range(actors):
+            ac, x, y, state = numbers[i:i + 4]
+            delta._actors[actor_of(ac)] = (x, y, value_of(state))
+            i += 4
+        for _ in range(removed):
+            delta._removed.append((numbers[i], actor_of(numbers[i + 1])))
+            i += 2
+        for _ in range(properties):
+            delta._properties[properties_of(value_of(numbers[i]))] = \
+                value_of(numbers[i + 1])
+            i += 2
+        return delta
+
+
+class History(Stack):
+    """The undo history of a game: a Stack of its entries, usually Deltas,
+    kept within a budget of entries and bytes.
+
+    When there are more than max_entries entries, or the entries take more
+    than max_bytes, old entries are evicted, according to policy:
+    "drop" forgets the oldest entry, so the game can no longer be undone that
+    far back; "thin" merges two neighbouring entries into one, so the game
+    can still be undone as far back, but skips the states in between.
+    Thinning merges the oldest two neighbours that cover as many moves as
+    each other (or, if there are none, the two covering the fewest moves
+    together), like the carries of a binary counter, so the older the
+    entries, the more moves each covers. The entry on top, which the game is
+    still recording into, is never evicted.
+
+    Deltas more than pack_after entries below the top are packed (see
+    Delta.pack) with the pack function given, and unpacked when they come
+    back on top. The values they refer to by number (see intern) count
+    towards max_bytes. Once there are twice as many of them as there were
+    just after the last time, the packed entries are packed again against a
+    new table, which forgets the values only evicted entries referred to.
+
+    === Public Attributes ===
+    max_entries:
+        The most entries to keep, or None for no limit
+    max_bytes:
+        The most bytes (see get_size) the entries may take, or None for no
+        limit
+    policy:
+        "drop" or "thin"
+    pack_after:
+        How many entries below the top are kept unpacked, or None to never
+        pack entries
+    merged:
+        If not None, called with the depth below the top of the later of two
+        entries whenever they are merged
+    """
+    # === Private Attributes ===
+    # _pack:
+    #     Packs a Delta into a PackedDelta
+    # _unpack:
+    #     Unpacks a PackedDelta back into a Delta
+    # _values:
+    #     The values that packed entries refer to by number (see intern)
+    # _value_ids:
+    #     Maps each value in _values to its number, its index in _values
+    # _values_bytes:
+    #     The bytes taken by the values in _values
+    # _live_values:
+    #     The number of values in _values just after the packed entries were
+    #     last packed against a new table
+    # _spans:
+    #     The number of moves covered by each entry
+    # _sizes:
+    #     The bytes taken by each entry but the top one, which may still grow
+    # _bytes:
+    #     The sum of _sizes
+    max_entries: Optional[int]
+    max_bytes: Optional[int]
+    policy: str
+    pack_after: Optional[int]
+    merged: Optional[Callable[[int], None]]
+    _pack: Optional[Callable[[Delta], PackedDelta]]
+    _unpack: Optional[Callable[[PackedDelta], Delta]]
+    _values: List[Any]
+    _value_ids: Dict[Any, int]
+    _values_bytes: int
+    _live_values: int
+    _spans: List[int]
+    _sizes: List[int]
+    _bytes: int
+
+    def __init__(self, max_entries: Optional[int] = None,
+                 max_bytes: Optional[int] = None, policy: str = "drop",
+                 pack_after: Optional[int] = None,
+                 pack: Optional[Callable[[Delta], PackedDelta]] = None,
+                 unpack: Optional[Callable[[PackedDelta], Delta]] = None) \
+            -> None:
+        """Initialize a new empty History with the given budget, packing
+        entries with <pack> and unpacking them with <unpack>.
+
+        Raise a ValueError if <policy> is neither "drop" nor "thin".
+        """
+        Stack.__init__(self)
+        if policy not in ("drop", "thin"):
+            raise ValueError("unknown eviction policy: " + policy)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.pack_after = pack_after
+        self.merged = None
+        self._pack = pack
+        self._unpack = unpack
+        self._spans = []
+        self._sizes = []
+        self._bytes = 0
+        self._clear_values()
+
+    def clear(self) -> None:
+        """Remove every entry from this History."""
+        self._items = []
+        self._spans = []
+        self._sizes = []
+        self._bytes = 0
+        self._clear_values()
+
+    def _clear_values(self) -> None:
+        """Forget every value interned so far."""
+        self._values = []
+        self._value_ids = {}
+        self._values_bytes = 0
+        self._live_values = 0
+
+    def intern(self, value: Any) -> int:
+        """Return the number standing for <value>, a hashable value, in the
+        entries packed into this History.
+
+        >>> history = History()
+        >>> history.intern("Wall isPush"), history.intern(None)
+        (0, 1)
+        >>> history.intern("Wall isPush")
+        0
+        """
+        number = self._value_ids.get(value)
+        if number is None:
+            number = self._value_ids[value] = len(self._values)
+            self._values.append(value)
+            self._values_bytes += sys.getsizeof(value)
+        return number
+
+    def get_interned(self, number: int) -> Any:
+        """Return the value <number> stands for (see intern)."""
+        return self._values[number]
+
+    def get_size(self) -> int:
+        """Return about how many bytes the entries take.
+
+        >>> history = History()
+        >>> history.push(Delta([], None, True))
+        >>> history.get_size() > 0
+        True
+        """
+        if self.is_empty():
+            return self._values_bytes
+        return self._bytes + self._entry_size(self._items[-1]) \
+            + self._values_bytes
+
+    def get_packed_count(self) -> int:
+        """Return the number of entries that are packed."""
+        return sum(isinstance(entry, PackedDelta) for entry in self._items)
+
+    def get_spans(self) -> List[int]:
+        """Return the number of moves covered by each entry, oldest first."""
+        return list(self._spans)
+
+    def get_values(self) -> List[Any]:
+        """Return the values that packed entries refer to, in the order of
+        their numbers (see intern).
+        """
+        return list(self._values)
+
+    def restore(self, entries: List[PackedDelta], spans: List[int],
+                values: List[Any]) -> None:
+        """Replace the entries of this History with <entries>, oldest
+        first, packed with <values> as the values they refer to by number,
+        each covering the number of moves in <spans>. The top entry is
+        unpacked, and old entries are evicted if they are over the budget.
+        """
+        self._clear_values()
+        for value in values:
+            self.intern(value)
+        self._live_values = len(self._values)
+        self._items = list(entries)
+        self._spans = list(spans)
+        self._sizes = [self._entry_size(entry) for entry in self._items[:-1]]
+        self._bytes = sum(self._sizes)
+        if self._items:
+            self._items[-1] = self._unpack(self._items[-1])
+        self.trim()
+
+    def push(self, item: Any) -> None:
+        """Add a new entry on top of this History, packing and evicting
+        older entries as needed to stay within the budget.
+        """
+        if not self.is_empty():
+            depth = self.size() - 1 - (self.pack_after or 0)
+            if self.pack_after is not None and depth >= 0:
+                self._pack_at(depth)
+            size = self._entry_size(self._items[-1])
+            self._sizes.append(size)
+            self._bytes += size
+        Stack.push(self, item)
+        self._spans.append(1)
+        self._collect_values()
+        self._evict()
+
+    def pop(self) -> Any:
+        """Remove and return the entry on top of this History.
+
+        Raise an EmptyStackError if this History is empty.
+        """
+        item = Stack.pop(self)
+        self._spans.pop()
+        if self._sizes:
+            self._bytes -= self._sizes.pop()
+            if isinstance(self._items[-1], PackedDelta):
+                self._items[-1] = self._unpack(self._items[-1])
+        return item
+
+    def trim(self) -> None:
+        """Pack and evict old entries until this History is within its
+        budget, after the budget changed.
+        """
+        if self.pack_after is not None:
+            for i in range(self.size() - 1 - self.pack_after):
+                self._pack_at(i)
+        self._collect_values()
+        self._evict()
+
+    def _collect_values(self) -> None:
+        """Pack the packed entries again against a new table of values if
+        the table has doubled since the last time, as described above.
+        """
+        if len(self._values) <= 2 * max(self._live_values, 64):
+            return
+        packed = [i for i, entry in enumerate(self._items)
+                  if isinstance(entry, PackedDelta)]
+        deltas = [self._unpack(self._items[i]) for i in packed]
+        self._clear_values()
+        for i, delta in zip(packed, deltas):
+            self._items[i] = self._pack(delta)
+        self._live_values = len(self._values)
+
+    def _evict(self) -> None:
+        """Evict old entries until this History is within its budget."""
+        while self._over_budget():
+            if self.policy == "drop":
+                self._items.pop(0)
+                self._spans.pop(0)
+                self._bytes -= self._sizes.pop(0)
+            elif not self._thin():
+                break
+
+    def _over_budget(self) -> bool:
+        """Return whether this History is over budget and has an entry that
+        can be evicted.
+        """
+        if self.size() < 2:
+            return False
+        return (self.max_entries is not None
+                and self.size() > self.max_entries) \
+            or (self.max_bytes is not None
+                and self.get_size() > self.max_bytes)
+
+    def _thin(self) -> bool:
+        """Merge two neighbouring Deltas below the top, as described above.
+        Return whether there were two to merge.
+        """
+        best = None
+        for i in range(self.size() - 2):
+            if isinstance(self._items[i], (Delta, PackedDelta)) \
+                    and isinstance(self._items[i + 1], (Delta, PackedDelta)):
+                if self._spans[i] == self._spans[i + 1]:
+                    best = i
+                    break
+                if best is None or self._spans[i] + self._spans[i + 1] \
+                        < self._spans[best] + self._spans[best + 1]:
+                    best = i
+        if best is None:
+            return False
+        i = best
+        earlier = self._get_delta(i)
+        earlier.merge(self._get_delta(i + 1))
+        self._items[i] = earlier
+        self._spans[i] += self._spans[i + 1]
+        self._bytes -= self._sizes[i] + self._sizes[i + 1]
+        del self._items[i + 1], self._spans[i + 1], self._sizes[i + 1]
+        self._sizes[i] = self._entry_size(earlier)
+        self._bytes += self._sizes[i]
+        if self.pack_after is not None \
+                and self.size() - 1 - i > self.pack_after:
+            self._pack_at(i)
+        if self.merged is not None:
+            self.merged(self.size() - 1 - i)
+        return True
+
+    def _get_delta(self, i: int) -> Delta:
+        """Return entry <i>, a Delta or a PackedDelta, as a Delta."""
+        entry = self._items[i]
+        if isinstance(entry, PackedDelta):
+            return self._unpack(entry)
+        return entry
+
+    def _pack_at(self, i: int) -> None:
+        """Pack entry <i> if it is an unpacked Delta, updating its size if it
+        is not the top one.
+        """
+        entry = self._items[i]
+        if isinstance(entry, Delta) and self._pack is not None:
+            self._items[i] = self._pack(entry)
+            if i < len(self._sizes):
+                size = self._entry_size(self._items[i])
+                self._bytes += size - self._sizes[i]
+                self._sizes[i] = size
+
+    @staticmethod
+    def _entry_size(entry: Any) -> int:
+        """Return about how many bytes <entry> takes on its own."""
+        if isinstance(entry, (Delta, PackedDelta)):
+            return entry.get_size()
+        return sys.getsizeof(entry)
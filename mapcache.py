@@ -0,0 +1,204 @@
+"""
+=== Module Description ===
+This module contains the CompiledMap class, a map file parsed into the list
+of its actors, and the on-disk cache of compiled maps used by Game.load_map.
+
+A text map is parsed by scanning every one of its characters; a compiled map
+keeps only the size of the map and the tiles that hold an actor, with their
+positions, so a game can be built from it without the scan. At 5 bytes per
+actor it is smaller than the text unless a fifth of the tiles hold actors.
+Compiled maps are cached in MAP_CACHE_DIR under the hash of the text they
+were compiled from, so editing a map file never loads a stale version of it.
+
+The binary format is little-endian, and every array in it starts on a 4-byte
+boundary, so it can be read straight into arrays (or memory-mapped):
+
+    MAGIC                           8 bytes
+    width, height, actor count      3 x uint32
+    tiles                           the map character of every actor
+    xs, ys                          the position of every actor, uint16 each
+
+Actors are listed in the order Game.new creates them: row by row, left to
+right.
+"""
+
+from typing import List, Optional
+import hashlib
+import os
+import struct
+import sys
+from array import array
+from settings import *
+
+MAGIC = b"MEEPMAP2"
+_HEADER = struct.Struct("<8sIII")
+# The most tiles across or down a map, since positions are stored as uint16
+MAX_SIDE = 2 ** 16 - 1
+
+
+def padding(n: int) -> bytes:
+    """
+    Return the bytes to add after <n> bytes to reach a 4-byte boundary.
+    """
+    return b"\0" * (-n % 4)
+
+
+class CompiledMap:
+    """
+    A map, with the character and position of every tile holding an actor.
+
+    === Public Attributes ===
+    width, height:
+        The size of the map in tiles
+    tiles:
+        The map character of every actor, e.g. b"2" for Meepo or b"I" for Is
+    xs:
+        The x coordinate of every actor
+    ys:
+        The y coordinate of every actor
+
+    The coordinates are unsigned 16-bit in a compiled map file, but may be
+    of any integer type otherwise, such as for the actors of a restored game
+    (see Game.restore), some of which may have left the map.
+    """
+    width: int
+    height: int
+    tiles: bytes
+    xs: array
+    ys: array
+
+    def __init__(self, width: int, height: int, tiles: bytes, xs: array,
+                 ys: array) -> None:
+        """
+        Initialize a CompiledMap of the given size and actors.
+        """
+        self.width, self.height = width, height
+        self.tiles = tiles
+        self.xs = xs
+        self.ys = ys
+
+    @classmethod
+    def from_lines(cls, lines: List[str]) -> 'CompiledMap':
+        """
+        Return the compiled map of <lines>, the lines of a map file.
+
+        Raise a ValueError if the map is more than MAX_SIDE tiles across or
+        down.
+
+        >>> compiled = CompiledMap.from_lines(["1.2", "MIY"])
+        >>> compiled.width, compiled.height, compiled.tiles
+        (3, 2, b'12MIY')
+        >>> list(compiled.xs), list(compiled.ys)
+        ([0, 2, 0, 1, 2], [0, 0, 1, 1, 1])
+        """
+        width = max((len(line) for line in lines), default=0)
+        if width > MAX_SIDE or len(lines) > MAX_SIDE:
+            raise ValueError("map too big to compile")
+        tiles = bytearray()
+        xs, ys = array("H"), array("H")
+        for y, line in enumerate(lines):
+            for x, tile in enumerate(line):
+                if tile in CHARACTERS or tile in SUBJECTS \
+                        or tile in ATTRIBUTES or tile == "I":
+                    tiles.append(ord(tile))
+                    xs.append(x)
+                    ys.append(y)
+        return cls(width, len(lines), bytes(tiles), xs, ys)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'CompiledMap':
+        """
+        Return the compiled map encoded in <data> by to_bytes.
+
+        Raise a ValueError if <data> is not a compiled map.
+        """
+        if len(data) < _HEADER.size:
+            raise ValueError("not a compiled map")
+        magic, width, height, count = _HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("not a compiled map")
+        start = _HEADER.size
+        tiles = data[start:start + count]
+        start += count + len(padding(count))
+        xs, ys = array("H"), array("H")
+        xs.frombytes(data[start:start + 2 * count])
+        start += 2 * count + len(padding(2 * count))
+        ys.frombytes(data[start:start + 2 * count])
+        if len(tiles) != count or len(ys) != count:
+            raise ValueError("truncated compiled map")
+        if sys.byteorder == "big":
+            xs.byteswap()
+            ys.byteswap()
+        return cls(width, height, tiles, xs, ys)
+
+    def to_bytes(self) -> bytes:
+        """
+        Return the encoding of this map in the compiled map format.
+
+        >>> compiled = CompiledMap.from_lines(["1.2", "MIY"])
+        >>> CompiledMap.from_bytes(compiled.to_bytes()).get_lines()
+        ['1.2', 'MIY']
+        """
+        xs, ys = array("H", self.xs), array("H", self.ys)
+        if sys.byteorder == "big":
+            xs.byteswap()
+            ys.byteswap()
+        return b"".join([_HEADER.pack(MAGIC, self.width, self.height,
+                                      len(self.tiles)),
+                         self.tiles, padding(len(self.tiles)),
+                         xs.tobytes(), padding(2 * len(xs)), ys.tobytes()])
+
+    def get_lines(self) -> List[str]:
+        """
+        Return the lines of this map, with "." on every tile without an
+        actor. Actors outside the map are left out.
+
+        >>> CompiledMap.from_lines(["1.2", "MIY"]).get_lines()
+        ['1.2', 'MIY']
+        >>> CompiledMap(2, 1, b"12", array("i", [1, -1]),
+        ...             array("i", [0, 0])).get_lines()
+        ['.1']
+        """
+        rows = [bytearray(b"." * self.width) for _ in range(self.height)]
+        for tile, x, y in zip(self.tiles, self.xs, self.ys):
+            if 0 <= x < self.width and 0 <= y < self.height:
+                rows[y][x] = tile
+        return [row.decode() for row in rows]
+
+
+def load(path: str, cache_dir: Optional[str] = MAP_CACHE_DIR) -> CompiledMap:
+    """
+    Return the compiled map of the map file at <path>, from <cache_dir> if
+    it was compiled before, otherwise compiling it and adding it to
+    <cache_dir>. No cache is used if <cache_dir> is None, or if it cannot be
+    written to.
+    """
+    with open(path, "rb") as f:
+        source = f.read()
+    if cache_dir is None:
+        return _compile(source)
+    digest = hashlib.blake2b(MAGIC + source, digest_size=16).hexdigest()
+    cached = os.path.join(cache_dir, digest + ".map")
+    try:
+        with open(cached, "rb") as f:
+            return CompiledMap.from_bytes(f.read())
+    except (OSError, ValueError):
+        pass
+    compiled = _compile(source)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        partial = "{}.{}.tmp".format(cached, os.getpid())
+        with open(partial, "wb") as f:
+            f.write(compiled.to_bytes())
+        os.replace(partial, cached)
+    except OSError:
+        pass
+    return compiled
+
+
+def _compile(source: bytes) -> CompiledMap:
+    """
+    Return the compiled map of <source>, the contents of a map file.
+    """
+    return CompiledMap.from_lines([line.strip() for line in
+                                   source.decode().splitlines()])
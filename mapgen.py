@@ -0,0 +1,166 @@
+"""
+=== Module Description ===
+This module generates random maps of any size in the map file format, for
+testing how the game scales (get_actor, _update, _copy...) on maps much
+larger than the bundled ones.
+
+Every map has a Bush border, the rules "Meepo isYou" and "Flag isVictory" in
+its top left corner, the player below them and a flag in the bottom right
+corner. The rest is filled at random with characters, loose word blocks and
+whole rules, at the given densities. The same seed gives the same map.
+
+A map generated with solvable=True can always be won: the player can walk to
+the flag along an empty path (right along its row, then down), and the
+random words and rules cannot affect Meepo or the flag.
+
+    python mapgen.py 2000 2000 --seed 1 --solvable -o maps/huge.txt
+"""
+
+from typing import List, Optional, Set, Tuple
+import argparse
+import random
+import sys
+from settings import *
+
+# The map characters of the actors that can be placed at random
+CHARACTER_TILES = "1345"
+# The words of the rules that cannot affect Meepo or the flag
+SAFE_SUBJECTS = "WR"
+SAFE_ATTRIBUTES = "PS"
+
+
+def generate(width: int, height: int, seed: int = 0, border: float = 1.0,
+             characters: float = 0.1, words: float = 0.02,
+             rules: float = 0.005, solvable: bool = False) -> List[str]:
+    """
+    Return the lines of a random <width> by <height> map.
+
+    <border> is the fraction of the border tiles that are Bushes (below 1,
+    the player may walk off the map). <characters>, <words> and <rules> are
+    the fractions of the other free tiles that get a character (Bush, Wall,
+    Rock or Flag), a loose word block, or the start of a three-tile rule
+    ("Subject Is Attribute", across or down).
+
+    Raise a ValueError if the map is smaller than 10 by 6.
+
+    >>> generate(10, 6, characters=0, words=0, rules=0)
+    ['1111111111', '1MIY.FIV.1', '1........1', '12.......1', '1.......51', \
+'1111111111']
+    >>> generate(40, 30, seed=3) == generate(40, 30, seed=3)
+    True
+    """
+    if width < 10 or height < 6:
+        raise ValueError("maps must be at least 10 by 6")
+    rng = random.Random(seed)
+    rows = [["."] * width for _ in range(height)]
+    for x in range(width):
+        for y in [0, height - 1]:
+            if rng.random() < border:
+                rows[y][x] = "1"
+    for y in range(1, height - 1):
+        for x in [0, width - 1]:
+            if rng.random() < border:
+                rows[y][x] = "1"
+
+    # Nothing random goes on reserved tiles.
+    reserved = set()
+    fixed = [(1, 1, "M"), (2, 1, "I"), (3, 1, "Y"), (5, 1, "F"), (6, 1, "I"),
+             (7, 1, "V"), (1, 3, "2"), (width - 2, height - 2, "5")]
+    for x, y, tile in fixed:
+        rows[y][x] = tile
+        reserved.add((x, y))
+    subjects, attributes = "".join(SUBJECTS), "".join(ATTRIBUTES)
+    if solvable:
+        subjects, attributes = SAFE_SUBJECTS, SAFE_ATTRIBUTES
+        # Keep the words of the fixed rules from being read into others.
+        for x, y, tile in fixed[:6]:
+            reserved.update(_around(x, y))
+        reserved.update((x, 3) for x in range(1, width - 1))
+        reserved.update((width - 2, y) for y in range(3, height - 1))
+
+    free = (width - 2) * (height - 2) - len(reserved)
+    for _ in range(int(rules * free)):
+        x, y = rng.randrange(1, width - 1), rng.randrange(1, height - 1)
+        dx, dy = rng.choice([(1, 0), (0, 1)])
+        cells = [(x + i * dx, y + i * dy) for i in range(3)]
+        if all(_is_free(rows, reserved, cx, cy) for cx, cy in cells):
+            for (cx, cy), tile in zip(cells, [rng.choice(subjects), "I",
+                                              rng.choice(attributes)]):
+                rows[cy][cx] = tile
+
+    word_tiles = subjects + attributes + "I"
+    for y in range(1, height - 1):
+        row = rows[y]
+        for x in range(1, width - 1):
+            if row[x] != "." or (x, y) in reserved:
+                continue
+            r = rng.random()
+            if r < characters:
+                row[x] = rng.choice(CHARACTER_TILES)
+            elif r < characters + words:
+                row[x] = rng.choice(word_tiles)
+    return ["".join(row) for row in rows]
+
+
+def _around(x: int, y: int) -> Set[Tuple[int, int]]:
+    """
+    Return the cells on and next to (x, y), diagonals included.
+    """
+    return {(x + dx, y + dy) for dx in [-1, 0, 1] for dy in [-1, 0, 1]}
+
+
+def _is_free(rows: List[List[str]], reserved: Set[Tuple[int, int]], x: int,
+             y: int) -> bool:
+    """
+    Return whether (x, y) is an empty tile inside the border of <rows> that
+    is not reserved.
+    """
+    return 0 < y < len(rows) - 1 and 0 < x < len(rows[y]) - 1 \
+        and rows[y][x] == "." and (x, y) not in reserved
+
+
+def solution(width: int, height: int) -> List[Tuple[int, int]]:
+    """
+    Return the moves that win a <width> by <height> map generated with
+    solvable=True.
+    """
+    return [(1, 0)] * (width - 3) + [(0, 1)] * (height - 5)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Generate a map and print it, or write it to the file given by --output.
+    """
+    parser = argparse.ArgumentParser(description="Generate a random map.")
+    parser.add_argument("width", type=int)
+    parser.add_argument("height", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--border", type=float, default=1.0,
+                        help="fraction of the border that is Bushes")
+    parser.add_argument("--characters", type=float, default=0.1,
+                        help="fraction of tiles with a character")
+    parser.add_argument("--words", type=float, default=0.02,
+                        help="fraction of tiles with a loose word block")
+    parser.add_argument("--rules", type=float, default=0.005,
+                        help="fraction of tiles starting a rule")
+    parser.add_argument("--solvable", action="store_true",
+                        help="make sure the map can be won")
+    parser.add_argument("-o", "--output", help="file to write the map to")
+    args = parser.parse_args(argv)
+    try:
+        lines = generate(args.width, args.height, args.seed, args.border,
+                         args.characters, args.words, args.rules,
+                         args.solvable)
+    except ValueError as error:
+        parser.error(str(error))
+    text = "\n".join(lines) + "\n"
+    if args.output:
+        with open(args.output, "wt") as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""
+=== Module Description ===
+This module measures the memory used by a game: the bytes per actor and per
+entry of the undo history, for keeping both small on big maps and in long
+sessions.
+
+Sizes are those of the Python objects reachable from the actors (or the
+history), as given by sys.getsizeof. An object shared by several actors, like
+the properties of their type or the name of their sprite, is counted once,
+so dividing by the number of actors gives what each actor costs on average.
+The game itself and the images, which belong to no actor, are not counted.
+
+    python memory.py maps/student_map5.txt --moves 100
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Set
+import argparse
+import json
+import random
+import sys
+from types import FunctionType, ModuleType
+import pygame
+from game import Game
+from history import PackedDelta
+
+# Objects of these types are never counted, nor what they refer to
+_NOT_COUNTED = (type, ModuleType, FunctionType, Game, pygame.Surface)
+
+
+def deep_size(roots: Iterable[Any], seen: Optional[Set[int]] = None) -> int:
+    """
+    Return the number of bytes of the objects in <roots> and the objects
+    they refer to, except those whose id is in <seen>. The ids of the
+    objects counted are added to <seen>.
+
+    >>> deep_size([(1, 2)], {id(1), id(2)}) == sys.getsizeof((1, 2))
+    True
+    """
+    if seen is None:
+        seen = set()
+    total = 0
+    stack = list(roots)
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, _NOT_COUNTED):
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif not isinstance(obj, (str, bytes, int, float, bool)):
+            if hasattr(obj, "__dict__"):
+                stack.append(vars(obj))
+            for class_ in type(obj).__mro__:
+                slots = class_.__dict__.get("__slots__", ())
+                if isinstance(slots, str):
+                    slots = [slots]
+                for slot in slots:
+                    if hasattr(obj, slot):
+                        stack.append(getattr(obj, slot))
+    return total
+
+
+def memory_report(game: Game) -> Dict[str, float]:
+    """
+    Return the number of actors of <game> and of entries in its undo
+    history, how many of those are packed, the bytes they use in total, and
+    the bytes per actor and per entry.
+    """
+    actors = game.get_actors()
+    seen = set()
+    actor_bytes = deep_size(actors, seen)
+    # The actors recorded in the history belong to the game; only what the
+    # entries hold on their own is theirs.
+    entries = game.get_history()
+    history_bytes = deep_size(entries, seen)
+    return {"actors": len(actors),
+            "actor_bytes": actor_bytes,
+            "bytes_per_actor": actor_bytes / max(len(actors), 1),
+            "history_entries": len(entries),
+            "history_packed_entries": sum(isinstance(entry, PackedDelta)
+                                          for entry in entries),
+            "history_bytes": history_bytes,
+            "bytes_per_history_entry": history_bytes / max(len(entries), 1)}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Print the memory report of a game of the map given on the command line,
+    after random moves.
+    """
+    parser = argparse.ArgumentParser(
+        description="Report the memory used by a game.")
+    parser.add_argument("map")
+    parser.add_argument("--moves", type=int, default=100,
+                        help="random moves to make first, for the history")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    game = Game(headless=True)
+    game.load_map(args.map)
+    game.new()
+    game._update()
+    rng = random.Random(args.seed)
+    for _ in range(args.moves):
+        if game.player is None or game.get_outcome() is not None:
+            break
+        game.step(*rng.choice([(1, 0), (-1, 0), (0, 1), (0, -1)]))
+    print(json.dumps(memory_report(game), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
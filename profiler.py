@@ -0,0 +1,175 @@
+"""
+=== Module Description ===
+This module contains the FrameProfiler class, which records where the frames
+of a running game spend their time, for finding the cause of stutter without
+attaching a profiler.
+
+A game records into the profiler set as its profiler attribute, and does no
+recording when it is None (the default):
+
+    game.profiler = FrameProfiler("frames.csv")
+    game.run()
+
+Every frame is timed phase by phase (handling events, updating the rules and
+drawing), and the profiler counts what the frame did: the get_actor calls,
+the actors pushed by the player's moves, the rules added and removed, and the
+depth and the size in bytes of the undo history at the end of the frame.
+"""
+
+from typing import Dict, Iterator, List, Optional
+import csv
+import json
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# The values recorded for every frame, in the order of the CSV columns
+FIELDS = ["frame", "total", "events", "update", "draw", "get_actor", "moves",
+          "pushed", "longest_push", "rules_added", "rules_removed",
+          "history", "history_bytes"]
+PHASES = ["events", "update", "draw"]
+
+
+class FrameProfiler:
+    """
+    Records the phase times and counts of the frames of a game.
+
+    === Public Attributes ===
+    frames:
+        The records of the most recent frames, oldest first. Each maps every
+        name in FIELDS to a number; times are in seconds.
+    path:
+        The .json or .csv file the records are written to, or None to only
+        keep them in memory
+    every:
+        The records are written to path after every this many frames, and
+        by write (which Game.run calls when the game ends)
+
+    === Private Attributes ===
+    _count:
+        The number of frames ended so far
+    _current:
+        The record of the frame being recorded, or None between frames
+    _unwritten:
+        The records of the frames ended since the last write
+    """
+    frames: deque
+    path: Optional[str]
+    every: int
+    _count: int
+    _current: Optional[Dict[str, float]]
+    _unwritten: List[Dict[str, float]]
+
+    def __init__(self, path: Optional[str] = None, every: int = 100,
+                 keep: int = 1000) -> None:
+        """
+        Initialize a FrameProfiler writing to <path> every <every> frames and
+        keeping the records of the last <keep> frames.
+        """
+        self.frames = deque(maxlen=keep)
+        self.path = path
+        self.every = every
+        self._count = 0
+        self._current = None
+        self._unwritten = []
+
+    def start_frame(self) -> None:
+        """
+        Start recording a new frame.
+        """
+        self._current = dict.fromkeys(FIELDS, 0)
+        self._current["frame"] = self._count
+        self._current["total"] = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """
+        Add the time spent in the body of a with statement to the phase
+        <name> of the current frame.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self._current is not None:
+                self._current[name] += time.perf_counter() - start
+
+    def count(self, name: str, n: int = 1) -> None:
+        """
+        Add <n> to the count <name> of the current frame. Counts made between
+        frames (e.g. by a headless game that is stepped) are not recorded.
+        """
+        if self._current is not None:
+            self._current[name] += n
+
+    def record_move(self, pushed: int) -> None:
+        """
+        Record a move of the player that pushed <pushed> actors.
+        """
+        if self._current is not None:
+            self._current["moves"] += 1
+            self._current["pushed"] += pushed
+            self._current["longest_push"] = max(
+                self._current["longest_push"], pushed)
+
+    def end_frame(self, history: int, history_bytes: int = 0) -> None:
+        """
+        Finish recording the current frame, whose game ended it with
+        <history> entries in its undo history, taking <history_bytes> bytes,
+        and write the records to path if it is time to.
+        """
+        frame = self._current
+        self._current = None
+        frame["total"] = time.perf_counter() - frame["total"]
+        frame["history"] = history
+        frame["history_bytes"] = history_bytes
+        self.frames.append(frame)
+        self._unwritten.append(frame)
+        self._count += 1
+        if self.path is not None and self._count % self.every == 0:
+            self.write()
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        Return the mean and the maximum of every time and count over the
+        kept frames, and which of them was the slowest, with the phase it
+        spent the most time in.
+        """
+        summary = {}
+        frames = list(self.frames)
+        if not frames:
+            return summary
+        for field in FIELDS[1:]:
+            values = [frame[field] for frame in frames]
+            summary[field] = {"mean": sum(values) / len(values),
+                              "max": max(values)}
+        slowest = max(frames, key=lambda frame: frame["total"])
+        summary["slowest"] = {"frame": slowest["frame"],
+                              "phase": max(PHASES, key=slowest.get)}
+        return summary
+
+    def write(self) -> None:
+        """
+        Write the records to path: a CSV file gets a row for every frame
+        ended since the last write, and a JSON file is replaced by the
+        summary and the kept records. Does nothing if path is None.
+        """
+        if self.path is None:
+            return
+        if self.path.endswith(".csv"):
+            with open(self.path, "a", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=FIELDS)
+                if f.tell() == 0:
+                    writer.writeheader()
+                writer.writerows(self._unwritten)
+        else:
+            report = {"summary": self.summary(), "frames": list(self.frames)}
+            with open(self.path, "wt") as f:
+                json.dump(report, f, indent=2)
+        self._unwritten = []
+
+    def get_frame_count(self) -> int:
+        """
+        Return the number of frames recorded so far.
+        """
+        return self._count
@@ -0,0 +1,184 @@
+"""
+=== Module Description ===
+This module contains the Replay class, a recording of a game that can be
+sought to any point, for reviewing long sessions and bug reports without
+playing them again from the start.
+
+A game records into the replay set by Game.start_recording, and does no
+recording when its replay attribute is None (the default):
+
+    game.start_recording()
+    game.run()
+    game.seek(1200)    # the game after the first 1200 entries of its log
+
+Every move that happens is logged as the index of its direction in
+DIRECTIONS, one byte each, and every undo as the byte UNDO. A running game
+handles all the keys pressed during a frame before it updates the rules
+once (see Game._frame), so every update of the rules after some moves or
+undos is logged too, as the byte FRAME. A copy of the whole game (a
+keyframe) is kept every KEYFRAME_EVERY entries, so seeking replays at most
+that many entries from the nearest keyframe before the point sought, plus
+the ones that an undo after that keyframe takes back to.
+"""
+
+from typing import Dict, List, Tuple
+from settings import *
+
+# The byte of an undo in the log; the bytes of the moves are below it
+UNDO = len(DIRECTIONS)
+# The byte of an update of the rules in the log
+FRAME = UNDO + 1
+
+
+class Replay:
+    """
+    A recording of the moves, undos and rule updates of a game since a
+    starting point.
+
+    Entry i of the log is the (i + 1)th move, undo or update recorded, and
+    state i is the state of the game after the first i entries: state 0 is
+    the starting point.
+
+    === Public Attributes ===
+    every:
+        A keyframe is kept every this many entries
+    """
+    # === Private Attributes ===
+    # _log:
+    #     The entries, as bytes: the index of a move in DIRECTIONS, UNDO or
+    #     FRAME
+    # _keyframes:
+    #     Maps i to a headless copy of state i, for i a multiple of every
+    # _entries:
+    #     For every entry of the game's undo history made since the starting
+    #     point, oldest first, the index of the state before its move
+    # _undo_to:
+    #     Maps the index of every undo in _log to the index of the state it
+    #     went back to
+    every: int
+    _log: bytearray
+    _keyframes: Dict[int, 'Game']
+    _entries: List[int]
+    _undo_to: Dict[int, int]
+
+    def __init__(self, start: 'Game', every: int = KEYFRAME_EVERY) -> None:
+        """
+        Initialize an empty Replay of the game <start> from its current
+        state, keeping a keyframe every <every> entries.
+        """
+        self.every = every
+        self._log = bytearray()
+        self._keyframes = {}
+        self._entries = []
+        self._undo_to = {}
+        self._keep_keyframe(start)
+
+    def __len__(self) -> int:
+        """
+        Return the number of entries recorded.
+        """
+        return len(self._log)
+
+    def record_move(self, game: 'Game', direction: Tuple[int, int],
+                    committed: bool) -> None:
+        """
+        Record that the player of <game> moved in <direction>. The move got
+        its own entry in the game's undo history if <committed>; otherwise
+        undoing the entry before it takes it back too.
+        """
+        if committed:
+            self._entries.append(len(self._log))
+        self._log.append(DIRECTIONS.index(direction))
+        self._keep_keyframe(game)
+
+    def record_undo(self, game: 'Game') -> None:
+        """
+        Record that the last entry of the undo history of <game> was undone.
+        """
+        self._undo_to[len(self._log)] = self._entries.pop()
+        self._log.append(UNDO)
+        self._keep_keyframe(game)
+
+    def record_frame(self, game: 'Game') -> None:
+        """
+        Record that the rules of <game> are being updated, unless nothing
+        was recorded since the last update.
+        """
+        if self._log and self._log[-1] != FRAME:
+            self._log.append(FRAME)
+            self._keep_keyframe(game)
+
+    def history_merged(self, depth: int) -> None:
+        """
+        Note that the entry <depth> entries below the top of the undo
+        history was merged into the one below it (see history.History), so
+        undoing that one now goes back to the state before both.
+        """
+        del self._entries[len(self._entries) - 1 - depth]
+
+    def _keep_keyframe(self, game: 'Game') -> None:
+        """
+        Keep a copy of <game>, in the state after the entries recorded, if
+        it is time for a keyframe.
+        """
+        if len(self._log) % self.every == 0:
+            keyframe = game._copy()
+            keyframe.headless = True
+            self._keyframes[len(self._log)] = keyframe
+
+    def seek(self, index: int) -> 'Game':
+        """
+        Return a new headless game in state <index>. Its undo history holds
+        only the moves replayed from the nearest keyframe.
+
+        Raise an IndexError if there is no state <index>.
+        """
+        if not 0 <= index <= len(self._log):
+            raise IndexError("no state {} in a replay of {} entries".format(
+                index, len(self._log)))
+        # Walk back to a keyframe, skipping from every undo to the state it
+        # went back to, and replay the moves and updates on the way forward.
+        entries = []
+        while index not in self._keyframes:
+            entry = self._log[index - 1]
+            if entry == UNDO:
+                index = self._undo_to[index - 1]
+            else:
+                entries.append(entry)
+                index -= 1
+        game = self._keyframes[index]._copy()
+        for entry in reversed(entries):
+            if entry == FRAME:
+                game._update()
+            else:
+                game._play_move(DIRECTIONS[entry])
+        return game
+
+    def get_log(self) -> bytes:
+        """
+        Return the log of the entries, one byte each: the index of a move in
+        DIRECTIONS, UNDO or FRAME.
+        """
+        return bytes(self._log)
+
+    @staticmethod
+    def from_log(start: 'Game', log: bytes,
+                 every: int = KEYFRAME_EVERY) -> 'Replay':
+        """
+        Return the Replay of playing <log>, as returned by get_log, on a copy
+        of the game <start>, which must be in the state the log was recorded
+        from and have the same undo history budget (which decides how far
+        back each undo goes).
+        """
+        game = start._copy()
+        game.headless = True
+        game.start_recording(every)
+        replay = game.replay
+        for entry in log:
+            if entry == UNDO:
+                game._undo()
+            elif entry == FRAME:
+                game._update()
+            else:
+                game._play_move(DIRECTIONS[entry])
+        return replay
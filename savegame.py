@@ -0,0 +1,234 @@
+"""
+=== Module Description ===
+This module contains the SavedGame class, the whole state of a game in a
+compact binary form, and the functions that write it to a file and read it
+back, for suspending a long session and resuming it, or recovering it after
+a crash (see Game.save and Game.restore).
+
+A saved game lists every actor the game ever had, in the order of their
+ranks (see grid.py), including the player after a loss, so that the history
+entries saved with it can refer to actors by rank.
+
+The binary format is little-endian, and every array in it starts on a 4-byte
+boundary, so it can be read in one go and cut into arrays (or
+memory-mapped), like the compiled maps of mapcache.py:
+
+    MAGIC                           8 bytes
+    width, height, actor count      3 x uint32
+    player                          int32, the rank of the player or -1
+    meta length, history length     2 x uint32
+    meta                            the rules, the properties of every type,
+                                    the sprites and the other values the
+                                    actors and history refer to, as the text
+                                    of a Python literal
+    tiles                           the map character of every actor
+    alive                           1 for every actor in the game, else 0
+    sprites                         the index of the sprite of every actor in
+                                    the meta sprites, uint16 each
+    xs, ys                          the position of every actor, int32 each
+    spans, lengths                  the moves covered by every history
+                                    entry, and its length in bytes, uint32
+                                    each
+    history                         the history entries, packed (see
+                                    history.PackedDelta), oldest first
+"""
+
+from typing import Any, Dict, List, Optional
+import ast
+import os
+import struct
+import sys
+from array import array
+from mapcache import padding
+
+MAGIC = b"MEEPSAV1"
+_HEADER = struct.Struct("<8sIIIiII")
+
+
+class SavedGame:
+    """
+    The state of a game, as saved to a file.
+
+    === Public Attributes ===
+    x_tiles, y_tiles:
+        The size of the map in tiles
+    tiles:
+        The map character of every actor, in the order of their ranks
+    alive:
+        1 for every actor that is in the game, 0 for one that was removed
+    sprite_ids:
+        The index in sprites of the sprite of every actor
+    xs, ys:
+        The position of every actor
+    player:
+        The rank of the player, or -1 if there is none
+    rules:
+        The rules in effect
+    running:
+        Whether the game is running
+    outcome:
+        "win", "lose" or None
+    properties:
+        Maps the name of every type of character to the flags of its
+        properties (see Properties.get_flags)
+    sprites:
+        The sprites of the actors
+    values:
+        The values the history entries refer to by number (see
+        History.intern)
+    history:
+        The data of every history entry, packed, oldest first
+    spans:
+        The number of moves covered by every history entry
+    """
+    x_tiles: int
+    y_tiles: int
+    tiles: bytes
+    alive: bytes
+    sprite_ids: array
+    xs: array
+    ys: array
+    player: int
+    rules: List[str]
+    running: bool
+    outcome: Optional[str]
+    properties: Dict[str, int]
+    sprites: List[Any]
+    values: List[Any]
+    history: List[bytes]
+    spans: array
+
+    def __init__(self) -> None:
+        """
+        Initialize the SavedGame of an empty game.
+        """
+        self.x_tiles, self.y_tiles = 0, 0
+        self.tiles = b""
+        self.alive = b""
+        self.sprite_ids = array("H")
+        self.xs, self.ys = array("i"), array("i")
+        self.player = -1
+        self.rules = []
+        self.running = True
+        self.outcome = None
+        self.properties = {}
+        self.sprites = []
+        self.values = []
+        self.history = []
+        self.spans = array("I")
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'SavedGame':
+        """
+        Return the saved game encoded in <data> by to_bytes.
+
+        Raise a ValueError if <data> is not a saved game.
+        """
+        if len(data) < _HEADER.size:
+            raise ValueError("not a saved game")
+        magic, x_tiles, y_tiles, count, player, meta_length, entries = \
+            _HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("not a saved game")
+        view = memoryview(data)
+        start = _HEADER.size
+
+        def take(length: int) -> memoryview:
+            nonlocal start
+            chunk = view[start:start + length]
+            if len(chunk) != length:
+                raise ValueError("truncated saved game")
+            start += length + len(padding(length))
+            return chunk
+
+        saved = cls()
+        saved.x_tiles, saved.y_tiles = x_tiles, y_tiles
+        saved.player = player
+        try:
+            meta = ast.literal_eval(bytes(take(meta_length)).decode())
+            saved.rules = meta["rules"]
+            saved.running = meta["running"]
+            saved.outcome = meta["outcome"]
+            saved.properties = meta["properties"]
+            saved.sprites = meta["sprites"]
+            saved.values = meta["values"]
+        except (SyntaxError, ValueError, KeyError, TypeError):
+            raise ValueError("not a saved game")
+        saved.tiles = bytes(take(count))
+        saved.alive = bytes(take(count))
+        saved.sprite_ids = _array("H", take(2 * count))
+        saved.xs = _array("i", take(4 * count))
+        saved.ys = _array("i", take(4 * count))
+        saved.spans = _array("I", take(4 * entries))
+        lengths = _array("I", take(4 * entries))
+        for length in lengths:
+            saved.history.append(_array("i", take(length)).tobytes())
+        return saved
+
+    def to_bytes(self) -> bytes:
+        """
+        Return the encoding of this game in the saved game format.
+        """
+        meta = repr({"rules": self.rules, "running": self.running,
+                     "outcome": self.outcome,
+                     "properties": self.properties,
+                     "sprites": self.sprites,
+                     "values": self.values}).encode()
+        lengths = array("I", [len(entry) for entry in self.history])
+        parts = [_HEADER.pack(MAGIC, self.x_tiles, self.y_tiles,
+                              len(self.tiles), self.player, len(meta),
+                              len(self.history)),
+                 meta, padding(len(meta)),
+                 self.tiles, padding(len(self.tiles)),
+                 self.alive, padding(len(self.alive)),
+                 _little(array("H", self.sprite_ids)),
+                 padding(2 * len(self.sprite_ids)),
+                 _little(array("i", self.xs)), _little(array("i", self.ys)),
+                 _little(array("I", self.spans)), _little(lengths)]
+        for entry in self.history:
+            numbers = array("i")
+            numbers.frombytes(entry)
+            parts.append(_little(numbers))
+        return b"".join(parts)
+
+
+def _array(typecode: str, data: memoryview) -> array:
+    """
+    Return the array of <typecode> stored little-endian in <data>.
+    """
+    numbers = array(typecode)
+    numbers.frombytes(data)
+    if sys.byteorder == "big":
+        numbers.byteswap()
+    return numbers
+
+
+def _little(numbers: array) -> bytes:
+    """
+    Return the bytes of <numbers> in little-endian order.
+    """
+    if sys.byteorder == "big":
+        numbers = array(numbers.typecode, numbers)
+        numbers.byteswap()
+    return numbers.tobytes()
+
+
+def save(saved: SavedGame, path: str) -> None:
+    """
+    Write <saved> to the file at <path>. The file is replaced at once, so a
+    crash while saving leaves the previous save whole.
+    """
+    partial = "{}.{}.tmp".format(path, os.getpid())
+    with open(partial, "wb") as f:
+        f.write(saved.to_bytes())
+    os.replace(partial, path)
+
+
+def load(path: str) -> SavedGame:
+    """
+    Return the game saved in the file at <path>, read in one go.
+
+    Raise a ValueError if the file is not a saved game.
+    """
+    with open(path, "rb") as f:
+        return SavedGame.from_bytes(f.read())
@@ -21,8 +21,37 @@ YELLOW = (255, 255, 0)
 ##########################################################
 
 FPS = 10
+# Whether Game.run sleeps until there is input instead of polling FPS times
+# a second.
+WAIT_FOR_EVENTS = False
+# The .json or .csv file the game running as a script writes the time and
+# counts of its frames to (see profiler.py), or None to not record them.
+PROFILE_PATH = None
+# A recorded game (see replay.py) keeps a copy of itself every this many
+# moves and undos, to seek from.
+KEYFRAME_EVERY = 100
+# The budget of the undo history (see history.History): the most entries and
+# bytes it keeps (None for no limit), how it evicts old entries ("drop" or
+# "thin"), and how many entries below the top are kept unpacked (None to never
+# pack them).
+HISTORY_MAX_ENTRIES = None
+HISTORY_MAX_BYTES = 64 * 2 ** 20
+HISTORY_POLICY = "thin"
+HISTORY_PACK_AFTER = 100
+# The file the game running as a script resumes from, if it exists, and
+# saves itself to (see savegame.py) every AUTOSAVE_EVERY moves and when it
+# ends, or None to not save it.
+SAVE_PATH = None
+AUTOSAVE_EVERY = 50
 TITLE = "Base Game"
 TILESIZE = 35
+# The most tiles across and down the window shows. The window of a bigger map
+# scrolls to follow the player, keeping them SCROLL_MARGIN tiles away from
+# its edges where the map allows.
+VIEW_TILES = (48, 27)
+SCROLL_MARGIN = 4
+# The moves of the player: up, down, left and right
+DIRECTIONS = [(0, -1), (0, 1), (-1, 0), (1, 0)]
 
 SUBJECTS = {"W": "Wall", "R": "Rock", "F": "Flag", "M": "Meepo"}
 ATTRIBUTES = {"P": "Push", "S": "Stop", "V": "Victory", "L": "Lose", "Y": "You"}
@@ -31,6 +60,9 @@ CHARACTERS = {"1": "Bush", "2": "Meepo", "3": "Wall", "4": "Rock", "5": "Flag"}
 BASE_DIR = "."
 SPRITES_DIR = "{}/sprites".format(BASE_DIR)
 MAP_PATH = "{}/maps/student_map5.txt".format(BASE_DIR)
+# Where compiled maps are cached (see mapcache.py), or None to parse every
+# map from its text each time it is loaded.
+MAP_CACHE_DIR = "{}/.mapcache".format(BASE_DIR)
 
 # Actors' sprites
 PLAYER_SPRITE_R1 = "{}/playerR1.png".format(SPRITES_DIR)
@@ -0,0 +1,291 @@
+"""
+=== Module Description ===
+This module contains the Solver class, which searches for the moves that win
+a game, for checking that maps can be solved and for giving hints.
+
+The search runs on a Board (see board.py), so that trying a move does not
+copy a whole Game. Rules are part of the state: forming "Flag isVictory" or
+breaking "Meepo isYou" leads to a different state than the same positions
+with other rules.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+import argparse
+import glob
+import hashlib
+import heapq
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from board import Board, WIN
+from settings import ATTRIBUTES, DIRECTIONS
+
+MARGIN = 1
+MAX_STATES = 2000000
+
+DIRECTION_NAMES = {(0, -1): "up", (0, 1): "down", (-1, 0): "left",
+                   (1, 0): "right"}
+
+
+def state_hash(board: Board) -> bytes:
+    """
+    Return a 64-bit hash of the canonical encoding of the state of <board>
+    (see Board.key).
+    """
+    return hashlib.blake2b(board.key(), digest_size=8).digest()
+
+
+class Solver:
+    """
+    Searches the states reachable from a board for one where the game is won.
+
+    === Public Attributes ===
+    expanded:
+        The number of states whose moves were tried by the last search
+    gave_up:
+        Whether the last search stopped at max_states before it could tell
+        whether the game can be won
+    margin:
+        The search skips the states with an actor more than this many cells
+        outside the map, since a player that walks out through a gap in the
+        border could otherwise go on forever
+    max_states:
+        The search gives up once this many states have been seen
+
+    === Private Attributes ===
+    _start:
+        The board to search from
+    _seen:
+        Transposition table of the last search: maps the hash of every state
+        seen to the hash of the state it was first reached from and the move
+        that reached it. The starting state maps to None.
+    """
+    expanded: int
+    gave_up: bool
+    margin: int
+    max_states: int
+    _start: Board
+    _seen: Dict[bytes, Optional[Tuple[bytes, Tuple[int, int]]]]
+
+    def __init__(self, board: Board, max_states: int = MAX_STATES,
+                 margin: int = MARGIN) -> None:
+        """
+        Initialize a Solver searching from <board>, whose rules must be up to
+        date (see Board.update).
+        """
+        self._start = board
+        self.max_states = max_states
+        self.margin = margin
+        self.expanded = 0
+        self.gave_up = False
+        self._seen = {}
+
+    def solve(self, method: str = "bfs") -> Optional[List[Tuple[int, int]]]:
+        """
+        Return a list of (dx, dy) moves that wins the game, or None if there
+        is none (or none within max_states).
+
+        <method> is "bfs", which finds a shortest solution, or "astar", which
+        is guided by the distance from the player to the nearest winning
+        actor and usually expands fewer states.
+        """
+        if method == "bfs":
+            return self._search(False)
+        elif method == "astar":
+            return self._search(True)
+        raise ValueError("unknown method: {}".format(method))
+
+    def _search(self, guided: bool) -> Optional[List[Tuple[int, int]]]:
+        """
+        Search breadth-first, or by least moves plus estimate if <guided>.
+        """
+        self.expanded = 0
+        self.gave_up = False
+        start = self._start.copy()
+        start_hash = state_hash(start)
+        self._seen = {start_hash: None}
+        if start.outcome == "win":
+            return []
+        frontier = []
+        queue = deque()
+        count = 0
+        if guided:
+            heapq.heappush(frontier, (estimate(start), count, 0, start,
+                                      start_hash))
+        else:
+            queue.append((start, start_hash))
+
+        while frontier or queue:
+            if guided:
+                _, _, moves, board, board_hash = heapq.heappop(frontier)
+            else:
+                board, board_hash = queue.popleft()
+                moves = 0
+            self.expanded += 1
+            for direction in DIRECTIONS:
+                child = board.copy()
+                if not child.step(*direction) \
+                        or not child.in_bounds(self.margin):
+                    continue
+                child_hash = state_hash(child)
+                if child_hash in self._seen:
+                    continue
+                self._seen[child_hash] = (board_hash, direction)
+                if child.outcome == "win":
+                    return self._path(child_hash)
+                if child.player < 0:
+                    continue
+                if len(self._seen) >= self.max_states:
+                    self.gave_up = True
+                    return None
+                if guided:
+                    count += 1
+                    heapq.heappush(frontier, (moves + 1 + estimate(child),
+                                              count, moves + 1, child,
+                                              child_hash))
+                else:
+                    queue.append((child, child_hash))
+        return None
+
+    def _path(self, state: bytes) -> List[Tuple[int, int]]:
+        """
+        Return the moves leading from the starting state to <state>.
+        """
+        moves = []
+        while self._seen[state] is not None:
+            state, direction = self._seen[state]
+            moves.append(direction)
+        moves.reverse()
+        return moves
+
+
+def estimate(board: Board) -> int:
+    """
+    Return an estimate of the number of moves needed to win from <board>: the
+    distance from the player to the nearest actor that wins the game, or 0 if
+    nothing does yet.
+
+    This is not a lower bound, since a move can also change which actors win,
+    so a guided search may not find the shortest solution.
+    """
+    winning = board.alive & ((board.props[board.codes] & WIN) != 0)
+    if board.player < 0 or not winning.any():
+        return 0
+    px, py = board.xs[board.player], board.ys[board.player]
+    distances = abs(board.xs[winning] - px) + abs(board.ys[winning] - py)
+    return int(distances.min())
+
+
+def solve(game_: 'Game', method: str = "bfs",
+          max_states: int = MAX_STATES) -> Optional[List[Tuple[int, int]]]:
+    """
+    Return a list of (dx, dy) moves that wins <game_> from its current state,
+    or None if there is none within <max_states> states.
+    """
+    return Solver(Board.from_game(game_), max_states).solve(method)
+
+
+def solve_map(path: str, method: str = "bfs",
+              max_states: int = MAX_STATES) -> Dict[str, Any]:
+    """
+    Search for a solution of the map file at <path>, and return a report of
+    the search: the map, whether it is solvable (None if the search gave up),
+    the number of moves of the solution, the number of states expanded and
+    the time taken in seconds.
+    """
+    start = time.perf_counter()
+    board = Board.from_file(path)
+    board.update()
+    solver = Solver(board, max_states)
+    moves = solver.solve(method)
+    return {"map": path,
+            "solvable": None if solver.gave_up else moves is not None,
+            "moves": None if moves is None else len(moves),
+            "solution": None if moves is None
+            else " ".join(DIRECTION_NAMES[move] for move in moves),
+            "expanded": solver.expanded,
+            "seconds": round(time.perf_counter() - start, 3)}
+
+
+def is_level(path: str) -> bool:
+    """
+    Return whether the map at <path> can be won at all, i.e. has the word
+    "Victory" on it. The maps in maps/ that cannot are the fixtures of
+    tests.py.
+    """
+    victory = [tile for tile, word in ATTRIBUTES.items()
+               if word == "Victory"][0]
+    with open(path) as f:
+        return victory in f.read()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Solve every map given on the command line (by default every map in
+    maps/ that can be won, see is_level) in parallel, one process per CPU
+    core, and print a report.
+
+    Returns 1 if --require-solvable is given and some map was not shown to
+    be solvable, otherwise 0. A map the search gave up on (after
+    --max-states states) counts as a failure too, unless --allow-gave-up is
+    given, in which case it only gets a warning.
+    """
+    parser = argparse.ArgumentParser(
+        description="Solve or validate maps in parallel.")
+    parser.add_argument("maps", nargs="*",
+                        help="map files (default: every map in maps/ "
+                             "with the word Victory on it)")
+    parser.add_argument("--method", choices=["bfs", "astar"], default="bfs")
+    parser.add_argument("--max-states", type=int, default=MAX_STATES,
+                        help="give up on a map after this many states")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(),
+                        help="number of worker processes")
+    parser.add_argument("--json", action="store_true",
+                        help="print one JSON report per line")
+    parser.add_argument("--require-solvable", action="store_true",
+                        help="exit with status 1 if some map is "
+                             "unsolvable or was given up on")
+    parser.add_argument("--allow-gave-up", action="store_true",
+                        help="with --require-solvable, only warn about the "
+                             "maps given up on")
+    args = parser.parse_args(argv)
+    maps_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "maps")
+    paths = args.maps or [path for path in sorted(glob.glob(
+        os.path.join(maps_dir, "*map*.txt"))) if is_level(path)]
+
+    unsolvable, gave_up = [], []
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        reports = pool.map(solve_map, paths, [args.method] * len(paths),
+                           [args.max_states] * len(paths))
+        for report in reports:
+            name = os.path.basename(report["map"])
+            if report["solvable"] is False:
+                unsolvable.append(name)
+            elif report["solvable"] is None:
+                gave_up.append(name)
+            if args.json:
+                print(json.dumps(report), flush=True)
+            else:
+                verdict = {True: "solvable", False: "unsolvable",
+                           None: "gave up"}[report["solvable"]]
+                print("{:<30} {:<10} {:>6} moves {:>9} states {:>8.2f}s"
+                      .format(name, verdict,
+                              "-" if report["moves"] is None
+                              else report["moves"],
+                              report["expanded"], report["seconds"]),
+                      flush=True)
+    if gave_up:
+        print("warning: gave up after {} states on {}; raise --max-states to "
+              "check them".format(args.max_states, ", ".join(gave_up)),
+              file=sys.stderr)
+    if args.require_solvable and (unsolvable or gave_up
+                                  and not args.allow_gave_up):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -29,10 +29,47 @@ class Stack:
         """
         return self._items == []
 
+    def size(self) -> int:
+        """Return the number of items in this stack.
+
+        >>> s = Stack()
+        >>> s.push('hello')
+        >>> s.size()
+        1
+        """
+        return len(self._items)
+
+    def to_list(self) -> List:
+        """Return the items in this stack, from the bottom to the top.
+
+        >>> s = Stack()
+        >>> s.push('hello')
+        >>> s.push('goodbye')
+        >>> s.to_list()
+        ['hello', 'goodbye']
+        """
+        return list(self._items)
+
     def push(self, item: Any) -> None:
         """Add a new element to the top of this stack."""
         self._items.append(item)
 
+    def peek(self) -> Any:
+        """Return the element at the top of this stack without removing it.
+
+        Raise an EmptyStackError if this stack is empty.
+
+        >>> s = Stack()
+        >>> s.push('hello')
+        >>> s.push('goodbye')
+        >>> s.peek()
+        'goodbye'
+        """
+        if self.is_empty():
+            raise EmptyStackError
+        else:
+            return self._items[-1]
+
     def pop(self) -> Any:
         """Remove and return the element at the top of this stack.
 
@@ -33,6 +33,20 @@ def setup_map(map: str) -> 'Game':
     return game
 
 
+def setup_headless(map: str) -> 'Game':
+    """Returns a headless game with the given map"""
+    return setup_headless_path(os.path.abspath(os.getcwd()) + '/maps/' + map)
+
+
+def setup_headless_path(path: str) -> 'Game':
+    """Returns a headless game with the map file at the given path"""
+    game = Game(headless=True)
+    game.load_map(path)
+    game.new()
+    game._update()
+    return game
+
+
 def set_keys(up, down, left, right, CTRL=0, Z=0):
     keys_pressed[pygame.K_UP] = up
     keys_pressed[pygame.K_DOWN] = down
@@ -591,6 +605,1014 @@ def test_after_undo():
     test_follow_rule_meepo_is_you()
 
 
+def test_get_actor_follows_moves():
+    """
+    Check that get_actor finds actors at their new position after they move,
+    including when they are moved directly
+    """
+    game = setup_map("student_map2.txt")
+    set_keys(0, 0, 0, 1)
+    wall = \
+        [i for i in game._actors if isinstance(i, Block) and i.word == "Wall"][
+            0]
+    game.player.player_move(game)
+    assert game.get_actor(3, 1) is game.player
+    assert game.get_actor(4, 1) is wall
+    wall.x, wall.y = 10, 10
+    assert game.get_actor(4, 1) is None
+    assert game.get_actor(10, 10) is wall
+    for ac in game.get_actors():
+        assert ac in game._grid.get_all(ac.x, ac.y)
+
+
+def test_get_actor_shared_slot():
+    """
+    Check that get_actor returns the first actor in _actors when several
+    actors share a slot
+    """
+    game = setup_map("student_map5.txt")
+    rock = [ac for ac in game.get_actors() if isinstance(ac, actor.Rock)][0]
+    rock.x, rock.y = game.player.x, game.player.y
+    first = [ac for ac in game.get_actors()
+             if ac.x == game.player.x and ac.y == game.player.y][0]
+    assert game.get_actor(game.player.x, game.player.y) is first
+
+
+def test_update_skips_idle_frames(monkeypatch):
+    """
+    Check that _update re-checks no "Is" tile when nothing has moved, and
+    only the "Is" tiles around a move otherwise
+    """
+    game = setup_map("student_map2.txt")
+    checked = []
+    original = actor.Is.update
+
+    def counting_update(self, *args):
+        checked.append(self)
+        return original(self, *args)
+
+    monkeypatch.setattr(actor.Is, "update", counting_update)
+    game._update()
+    assert checked == []
+
+    set_keys(0, 0, 0, 1)
+    game.player.player_move(game)
+    game._update()
+    assert 0 < len(checked) <= len(game._is)
+    assert game.get_rules() == ["Wall isPush", "Meepo isYou"]
+
+
+def test_undo_reverts_move():
+    """
+    Check that undo puts back the actors, rules and player changed by a move,
+    and only records what the move changed
+    """
+    game = setup_map("student_map2.txt")
+    wall = \
+        [i for i in game._actors if isinstance(i, Block) and i.word == "Wall"][
+            0]
+    meepo = game.player
+    set_keys(0, 0, 0, 1)
+    game._play_move()
+    game._update()
+    assert game.get_rules() == ["Wall isPush", "Meepo isYou"]
+    assert len(game._history.peek()) < len(game.get_actors())
+    game._undo()
+    game._update()
+    assert (meepo.x, meepo.y) == (2, 1)
+    assert (wall.x, wall.y) == (3, 1)
+    assert game.get_rules() == ["Meepo isYou"]
+    assert game.player is meepo
+    assert game.get_actor(3, 1) is wall
+    assert game._history.is_empty()
+
+
+def test_undo_reverts_rule_flags(tmp_path):
+    """
+    Check that undo takes back the properties given by a rule the move formed
+    """
+    path = tmp_path / "wall_push.txt"
+    path.write_text("1111111111\n12W.IP3..1\n1MIY1....1\n1111111111\n")
+    game = setup_headless_path(str(path))
+    wall = [ac for ac in game.get_actors() if isinstance(ac, actor.Wall)][0]
+    game.step(1, 0)
+    assert wall.is_push()
+    game._undo()
+    game._update()
+    assert game.get_rules() == ["Meepo isYou"]
+    assert not wall.is_push()
+
+
+def test_undo_after_blocked_move():
+    """
+    Check that a blocked move adds no history entry, and that undo still goes
+    back to before the last move that happened
+    """
+    game = setup_map("student_map2.txt")
+    set_keys(0, 0, 0, 1)
+    game._play_move()
+    game._update()
+    set_keys(1, 0, 0, 0)
+    game._play_move()
+    game._update()
+    assert (game.player.x, game.player.y) == (3, 1)
+    game._undo()
+    assert (game.player.x, game.player.y) == (2, 1)
+    assert game._history.is_empty()
+
+
+def test_move_is_a_transaction(monkeypatch):
+    """
+    Check that a blocked move opens no history entry, and that a move whose
+    rule update fails is rolled back entirely
+    """
+    import game as game_module
+    game = setup_headless("student_map2.txt")
+    deltas = []
+
+    def counting_delta(*args):
+        deltas.append(Delta(*args))
+        return deltas[-1]
+
+    monkeypatch.setattr(game_module, "Delta", counting_delta)
+    assert not game.step(0, -1)
+    assert deltas == [] and game._history.is_empty()
+
+    def broken_rule(rule):
+        raise RuntimeError(rule)
+
+    before = (game.get_hash(), [(ac.x, ac.y) for ac in game.get_actors()])
+    monkeypatch.setattr(game, "apply_additional_rule", broken_rule)
+    with pytest.raises(RuntimeError):
+        game.step(1, 0)
+    assert (game.get_hash(),
+            [(ac.x, ac.y) for ac in game.get_actors()]) == before
+    assert game.get_rules() == ["Meepo isYou"]
+    assert game._history.is_empty() and game._delta is None
+
+    monkeypatch.undo()
+    assert game.step(1, 0)
+    assert game.get_rules() == ["Wall isPush", "Meepo isYou"]
+    assert game._history.size() == 1
+
+
+def test_actors_of_type_follow_undo(tmp_path):
+    """
+    Check that the index of actors by type matches the list of actors after
+    a loss removes the player and after that is undone, and that rules are
+    applied to the actors of their type
+    """
+    path = tmp_path / "lose.txt"
+    path.write_text("1111111\n"
+                    "1MIY..1\n"
+                    "1RIL..1\n"
+                    "1.24..1\n"
+                    "1111111\n")
+    game = setup_headless_path(str(path))
+    assert Game.parse_rule("Rock isLose") == (Rock, "Lose")
+    assert all(rock.is_lose() for rock in game.get_actors_of_type(Rock))
+
+    def check_types():
+        for type_ in [Meepo, Rock, Bush, Is, Subject]:
+            assert game.get_actors_of_type(type_) == \
+                [ac for ac in game.get_actors() if type(ac) is type_]
+
+    check_types()
+    game.step(-1, 0)
+    game.step(1, 0)
+    game.step(1, 0)
+    assert game.get_outcome() == "lose"
+    assert game.get_actors_of_type(Meepo) == []
+    check_types()
+    game._undo()
+    check_types()
+    assert game.player is game.get_actors_of_type(Meepo)[0]
+
+
+def test_rules_set_properties_of_type():
+    """
+    Check that the characters of a type share the properties the rules give
+    them, which a copy of the game has its own copy of
+    """
+    game = setup_headless("student_map5.txt")
+    walls = game.get_actors_of_type(Wall)
+    properties = game.get_properties(Wall)
+    assert all(wall.get_properties() is properties for wall in walls)
+    copy = game._copy()
+    copy.apply_additional_rule("Wall isPush")
+    assert all(wall.is_push() for wall in copy.get_actors_of_type(Wall))
+    assert not any(wall.is_push() for wall in walls)
+    game._delta = Delta([], game.player, True)
+    game.apply_additional_rule("Wall isStop")
+    assert all(wall.is_stop() for wall in walls)
+    assert len(game._delta) == 0
+    assert game._hash == game._full_hash()
+
+
+def test_memory_report():
+    """
+    Check that actors carry no instance dictionary, and that the memory
+    report counts the actors and the history
+    """
+    from memory import memory_report
+    game = setup_headless("student_map5.txt")
+    for ac in game.get_actors():
+        assert not hasattr(ac, "__dict__")
+    game.step(0, 1)
+    game.step(1, 0)
+    report = memory_report(game)
+    assert report["actors"] == len(game.get_actors())
+    assert report["history_entries"] == 2
+    assert 0 < report["bytes_per_actor"] < 1000
+    assert report["bytes_per_history_entry"] > 0
+
+
+def test_history_budget():
+    """
+    Check that the undo history stays within its budget: dropping old
+    entries forgets the oldest states, thinning keeps the start, and packed
+    entries are undone the same as unpacked ones and take less memory
+    """
+    import random
+    from memory import memory_report
+    rng = random.Random(3)
+    moves = [rng.choice(DIRECTIONS) for _ in range(300)]
+
+    def play(max_entries=None, max_bytes=None, policy="thin",
+             pack_after=None):
+        game = setup_headless("student_map5.txt")
+        game.set_history_budget(max_entries, max_bytes, policy, pack_after)
+        states = [game.get_hash()]
+        for dx, dy in moves:
+            if game.step(dx, dy):
+                if game.get_outcome() is not None:
+                    break
+                states.append(game.get_hash())
+        return game, states
+
+    def undo_all(game):
+        undone = []
+        while not game._history.is_empty():
+            game._undo()
+            assert game._hash == game._full_hash()
+            undone.append(game.get_hash())
+        return undone
+
+    game, states = play()
+    assert len(states) > 40
+    assert undo_all(game) == states[-2::-1]
+
+    game, states = play(pack_after=2)
+    assert memory_report(game)["history_packed_entries"] \
+        == game._history.size() - 3
+    assert memory_report(game)["bytes_per_history_entry"] \
+        < memory_report(play()[0])["bytes_per_history_entry"] / 2
+    assert undo_all(game) == states[-2::-1]
+
+    game, states = play(max_entries=10, policy="drop")
+    assert game._history.size() == 10
+    assert undo_all(game) == states[-2:-12:-1]
+
+    game, states = play(max_entries=10, pack_after=0)
+    assert game._history.size() == 10
+    undone = undo_all(game)
+    assert undone[-1] == states[0]
+    assert undone[:3] == states[-2:-5:-1]
+    assert all(state in states for state in undone)
+
+    game, states = play(max_bytes=2000)
+    assert 0 < game._history.get_size() <= 2000
+    assert undo_all(game)[-1] == states[0]
+    with pytest.raises(ValueError):
+        game.set_history_budget(policy="oldest")
+
+
+def test_history_forgets_evicted_values():
+    """
+    Check that the values interned for packed history entries do not pile up
+    as entries are evicted, count towards the budget, and are forgotten when
+    the history is cleared
+    """
+    import sys
+    from history import Delta, History
+    history = History(
+        max_entries=4, pack_after=1,
+        pack=lambda delta: delta.pack(id, str, history.intern),
+        unpack=lambda packed: packed.unpack(None, None,
+                                            history.get_interned))
+    for i in range(1000):
+        history.push(Delta(["Rule {}".format(i)], None, True))
+    assert len(history.get_values()) < 200
+    assert history.get_size() > sum(sys.getsizeof(value)
+                                    for value in history.get_values())
+    assert [history.pop().rules for _ in range(4)] == \
+        [["Rule {}".format(i)] for i in range(999, 995, -1)]
+    history.clear()
+    assert history.get_values() == [] and history.get_size() == 0
+
+
+def test_push_long_line(tmp_path):
+    """
+    Check that the player can push a line of walls longer than the recursion
+    limit, and that the line is not pushed at all when it is blocked
+    """
+    import sys
+    length = sys.getrecursionlimit() + 100
+    path = tmp_path / "long.txt"
+    path.write_text("1111111\n"
+                    "1MIY..1\n"
+                    "1WIP..1\n"
+                    "12" + "3" * length + "..1\n"
+                    "1111111\n")
+    game = setup_headless_path(str(path))
+    walls = game.get_actors_of_type(Wall)
+    assert game.step(1, 0)
+    assert game.player.x == 2
+    assert [wall.x for wall in walls] == list(range(3, 3 + length))
+    assert game.step(1, 0)
+    assert not game.step(1, 0)
+    assert game.player.x == 3
+    assert [wall.x for wall in walls] == list(range(4, 4 + length))
+
+
+def test_preview_same_as_move(tmp_path):
+    """
+    Check that previewing the moves changes nothing and tells what making
+    them does: whether the player moves, which actors move, and the outcome
+    """
+    import random
+    path = tmp_path / "ends.txt"
+    path.write_text("11111111\n"
+                    "1MIY...1\n"
+                    "1FIV...1\n"
+                    "1RIL...1\n"
+                    "1..4...1\n"
+                    "1.425..1\n"
+                    "11111111\n")
+    game = setup_headless_path(str(path))
+    assert [(p.moved, p.outcome) for p in game.legal_moves()] \
+        == [(True, "lose"), (False, None), (True, "lose"), (True, "win")]
+
+    paths = [os.path.abspath(os.getcwd()) + '/maps/' + map_name
+             for map_name in ["student_map2.txt", "student_map5.txt",
+                              "map.txt"]]
+    for map_path in paths + [str(path)]:
+        game = setup_headless_path(map_path)
+        moves = random.Random(map_path)
+        for _ in range(100):
+            before = (game.get_hash(), [(ac.x, ac.y, ac.sprite)
+                                        for ac in game.get_actors()])
+            previews = game.legal_moves()
+            assert (game.get_hash(), [(ac.x, ac.y, ac.sprite)
+                                      for ac in game.get_actors()]) == before
+            assert [p.direction for p in previews] == DIRECTIONS
+            for preview in previews:
+                game_copy = game._copy()
+                copies = list(zip(game.get_actors(), game_copy.get_actors()))
+                assert game_copy.step(*preview.direction) == preview.moved
+                assert {ac for ac, ac_copy in copies
+                        if (ac.x, ac.y) != (ac_copy.x, ac_copy.y)} \
+                    == set(preview.shifted)
+                assert game_copy.get_outcome() == preview.outcome
+            game.step(*moves.choice(DIRECTIONS))
+            if game.get_outcome():
+                break
+
+
+def test_images_loaded_once(monkeypatch):
+    """
+    Check that no image is read from disk while playing, undoing or copying
+    once the game is set up, and that actors share their images
+    """
+    game = setup_map("student_map2.txt")
+
+    def no_load(*args):
+        raise AssertionError("image read from disk during play")
+
+    monkeypatch.setattr(pygame.image, "load", no_load)
+    set_keys(0, 0, 0, 1)
+    game._play_move()
+    game._update()
+    game._copy()
+    game._undo()
+    game._update()
+    meepo = game.player
+    assert meepo.copy().walk_left[0] is meepo.walk_left[0]
+    assert load_image(IS_PURPLE) is load_image(IS_PURPLE)
+
+
+def test_headless_needs_no_display(monkeypatch):
+    """
+    Check that a headless game plays without a window or any image
+    """
+    def no_display(*args, **kwargs):
+        raise AssertionError("headless game used the display")
+
+    monkeypatch.setattr(pygame.display, "set_mode", no_display)
+    monkeypatch.setattr(pygame, "Surface", no_display)
+    monkeypatch.setattr(actor, "load_image", no_display)
+    game = setup_headless("student_map2.txt")
+    assert game.step(1, 0)
+    assert game.get_rules() == ["Wall isPush", "Meepo isYou"]
+    assert not game.step(0, 1)
+    game._undo()
+    assert (game.player.x, game.player.y) == (2, 1)
+
+
+def test_headless_same_as_window():
+    """
+    Check that a headless game gives the same results as the game with a
+    window for the same moves
+    """
+    moves = [(0, 1), (1, 0), (1, 0), (0, -1), (-1, 0), (0, -1), (1, 0),
+             (1, 0), (0, 1), (0, 1), (0, 1), (-1, 0)]
+    game = setup_map("student_map5.txt")
+    headless = setup_headless("student_map5.txt")
+    for dx, dy in moves:
+        set_keys(int(dy == -1), int(dy == 1), int(dx == -1), int(dx == 1))
+        moved = game._play_move()
+        game._update()
+        assert headless.step(dx, dy) == moved
+        assert headless.get_rules() == game.get_rules()
+        assert headless.get_outcome() == game.get_outcome()
+        assert [(ac.x, ac.y, ac.get_state()) for ac in headless.get_actors()] \
+            == [(ac.x, ac.y, ac.get_state()) for ac in game.get_actors()]
+
+
+def test_draw_only_changed_tiles(monkeypatch):
+    """
+    Check that drawing skips frames where nothing changed, updates only the
+    changed tiles otherwise, and draws the same picture as a full redraw
+    """
+    game = setup_map("student_map2.txt")
+    game._draw()
+    updates = []
+    monkeypatch.setattr(pygame.display, "update",
+                        lambda rects: updates.append(rects))
+    game._draw()
+    assert updates == []
+
+    set_keys(0, 0, 0, 1)
+    game._play_move()
+    game._update()
+    game._draw()
+    assert len(updates) == 1
+    assert 0 < len(updates[0]) <= 5
+    partial = pygame.image.tostring(game.screen, "RGB")
+    game._full_redraw = True
+    game._draw()
+    assert pygame.image.tostring(game.screen, "RGB") == partial
+
+
+def test_window_scrolls_on_big_maps(tmp_path, monkeypatch):
+    """
+    Check that the window of a map bigger than it follows the player, draws
+    only the actors in view, and that drawing after a move still gives the
+    same picture as a full redraw
+    """
+    import mapgen
+    width, height = VIEW_TILES[0] + 30, VIEW_TILES[1] + 10
+    path = tmp_path / "big.txt"
+    path.write_text("\n".join(mapgen.generate(width, height, seed=1,
+                                               solvable=True)) + "\n")
+    game = Game()
+    game.load_map(str(path))
+    game.new()
+    game._update()
+    assert game.size == (VIEW_TILES[0] * TILESIZE, VIEW_TILES[1] * TILESIZE)
+    blits = []
+
+    class CountingScreen:
+        def blit(self, *args):
+            blits.append(args)
+
+    monkeypatch.setattr(game, "screen", CountingScreen())
+    game._draw()
+    assert game.camera == (0, 0)
+    assert len(blits) < len(game.get_actors())
+    monkeypatch.undo()
+    game._full_redraw = True
+
+    for dx, dy in mapgen.solution(width, height)[:VIEW_TILES[0]]:
+        game.step(dx, dy)
+        game._draw()
+        assert game._in_view(game.player.x, game.player.y)
+        assert game.player.x - game.camera[0] >= min(SCROLL_MARGIN,
+                                                     game.player.x)
+    assert game.camera[0] > 0
+    game.step(1, 0)
+    game._draw()
+    partial = pygame.image.tostring(game.screen, "RGB")
+    game._full_redraw = True
+    game._draw()
+    assert pygame.image.tostring(game.screen, "RGB") == partial
+
+
+def test_run_waiting_for_events():
+    """
+    Check that the event-driven loop draws the game, then handles queued
+    events and stops when the window is closed
+    """
+    game = setup_map("student_map2.txt")
+    pygame.event.clear()
+    pygame.event.post(pygame.event.Event(pygame.QUIT))
+    game.run(wait_for_events=True)
+    assert not game.get_running()
+    assert not game._full_redraw
+
+
+def test_profiler_records_frames(tmp_path, monkeypatch):
+    """
+    Check that a profiled game records the phases and counts of its frames
+    and writes them out periodically and when it ends
+    """
+    import csv
+    from collections import defaultdict
+    from profiler import FrameProfiler
+    game = setup_map("student_map5.txt")
+    path = tmp_path / "frames.csv"
+    game.profiler = FrameProfiler(str(path), every=2)
+    monkeypatch.setattr(pygame.key, "get_pressed",
+                        lambda: defaultdict(int, {RIGHT: 1}))
+    pygame.event.clear()
+    for _ in range(3):
+        pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=RIGHT))
+        game._frame()
+
+    frames = list(game.profiler.frames)
+    assert [frame["frame"] for frame in frames] == [0, 1, 2]
+    assert [frame["moves"] for frame in frames] == [1, 1, 1]
+    assert [frame["history"] for frame in frames] == [1, 2, 3]
+    assert all(frame["get_actor"] > 0 for frame in frames)
+    assert all(frame["total"] >= frame["events"] + frame["update"]
+               + frame["draw"] for frame in frames)
+    with open(str(path)) as f:
+        rows = list(csv.DictReader(f))
+    assert [row["frame"] for row in rows] == ["0", "1"]
+    assert game.profiler.summary()["moves"]["mean"] == 1
+
+    pygame.event.post(pygame.event.Event(pygame.QUIT))
+    game.run(wait_for_events=True)
+    with open(str(path)) as f:
+        rows = list(csv.DictReader(f))
+    assert [row["frame"] for row in rows] == ["0", "1", "2", "3"]
+    FrameProfiler().write()
+
+
+def test_map_cache(tmp_path):
+    """
+    Check that a map loaded from the cache of compiled maps gives the same
+    game as its text, and that editing the map is not hidden by the cache
+    """
+    import mapcache
+    path = tmp_path / "map.txt"
+    path.write_text("1111\n12.1\nMIY.\n")
+    cache_dir = str(tmp_path / "cache")
+    compiled = mapcache.load(str(path), cache_dir)
+    assert len(os.listdir(cache_dir)) == 1
+    cached = mapcache.load(str(path), cache_dir)
+    assert cached.get_lines() == compiled.get_lines() \
+        == ["1111", "12.1", "MIY."]
+    assert (cached.width, cached.height) == (4, 3)
+    assert cached.tiles == compiled.tiles == b"1111121MIY"
+    assert list(cached.xs) == list(compiled.xs)
+    assert list(cached.ys) == list(compiled.ys)
+    path.write_text("1111\n1221\nMIY.\n")
+    assert mapcache.load(str(path), cache_dir).tiles == b"11111221MIY"
+    assert len(os.listdir(cache_dir)) == 2
+
+    game = setup_headless("student_map5.txt")
+    assert game._map_data is None
+    with open(os.path.join("maps", "student_map5.txt")) as f:
+        assert game.map_data == [line.strip() for line in f]
+    text = Game(headless=True)
+    text.map_data = list(game.map_data)
+    text.new()
+    text._update()
+    assert [(type(ac), ac.x, ac.y) for ac in game.get_actors()] == \
+        [(type(ac), ac.x, ac.y) for ac in text.get_actors()]
+    assert game.get_rules() == text.get_rules()
+
+
+def test_generated_maps(tmp_path):
+    """
+    Check that generated maps have the requested size, depend only on their
+    seed, and can be won when generated to be solvable
+    """
+    import mapgen
+    lines = mapgen.generate(30, 20, seed=1, characters=0.3, words=0.2,
+                            rules=0.05, solvable=True)
+    assert len(lines) == 20 and all(len(line) == 30 for line in lines)
+    assert lines == mapgen.generate(30, 20, seed=1, characters=0.3,
+                                    words=0.2, rules=0.05, solvable=True)
+    assert lines != mapgen.generate(30, 20, seed=2, characters=0.3,
+                                    words=0.2, rules=0.05, solvable=True)
+    path = tmp_path / "generated.txt"
+    path.write_text("\n".join(lines) + "\n")
+    game = setup_headless_path(str(path))
+    for dx, dy in mapgen.solution(30, 20):
+        game.step(dx, dy)
+    assert game.get_outcome() == "win"
+    with pytest.raises(ValueError):
+        mapgen.generate(9, 20)
+
+
+def test_board_same_as_actors():
+    """
+    Check that the NumPy board gives the same results as the actors for the
+    same moves
+    """
+    import random
+    for map_name in ["student_map2.txt", "student_map3.txt",
+                     "student_map5.txt", "map.txt"]:
+        game = Game(headless=True)
+        game.load_map(os.path.abspath(os.getcwd()) + '/maps/' + map_name)
+        game.new(board=True)
+        game._update()
+        board = game.board
+        board.update()
+        moves = random.Random(map_name)
+        for _ in range(100):
+            dx, dy = moves.choice([(1, 0), (-1, 0), (0, 1), (0, -1)])
+            assert board.step(dx, dy) == game.step(dx, dy)
+            assert board.rules == game.get_rules()
+            assert board.outcome == game.get_outcome()
+            assert [(board.xs[i], board.ys[i])
+                    for i in range(len(board.codes)) if board.alive[i]] \
+                == [(ac.x, ac.y) for ac in game.get_actors()]
+            if game.get_outcome():
+                break
+
+
+def test_solver_finds_win(tmp_path):
+    """
+    Check that both searches find moves that win the game, including one
+    that needs a rule to be formed first
+    """
+    from solver import solve
+    path = tmp_path / "solvable.txt"
+    path.write_text("11111111\n"
+                    "1MIY...1\n"
+                    "1F.....1\n"
+                    "1.I....1\n"
+                    "1.V....1\n"
+                    "12....51\n"
+                    "11111111\n")
+    for method in ["bfs", "astar"]:
+        game = setup_headless_path(str(path))
+        assert "Flag isVictory" not in game.get_rules()
+        moves = solve(game, method)
+        assert moves is not None
+        for dx, dy in moves:
+            game.step(dx, dy)
+        assert game.get_outcome() == "win"
+
+
+def test_solver_unsolvable():
+    """
+    Check that the solver reports a map with no way to win
+    """
+    from solver import Solver
+    from board import Board
+    game = setup_headless("student_map2.txt")
+    solver = Solver(Board.from_game(game))
+    assert solver.solve("bfs") is None
+    assert solver.expanded > 0
+
+
+def test_solver_stays_near_map(tmp_path):
+    """
+    Check that the solver does not follow a player out through a gap in the
+    border forever, but still reports the map as unsolvable
+    """
+    from solver import Solver
+    from board import Board
+    path = tmp_path / "gap.txt"
+    path.write_text("11111\n"
+                    "1MIY1\n"
+                    "12...\n"
+                    "11111\n")
+    board = Board.from_file(str(path))
+    board.update()
+    solver = Solver(board, max_states=1000)
+    assert solver.solve("bfs") is None and not solver.gave_up
+    solver = Solver(board, max_states=1000, margin=10 ** 6)
+    assert solver.solve("bfs") is None and solver.gave_up
+
+
+def test_batch_solver_reports(tmp_path, capsys):
+    """
+    Check that the batch solver reports on every map it is given, and fails
+    when asked to require solvable maps and one is unsolvable or was given
+    up on, unless giving up is allowed
+    """
+    import json
+    from solver import main, solve_map
+    path = tmp_path / "solvable.txt"
+    path.write_text("1111111\n"
+                    "1MIY..1\n"
+                    "1FIV..1\n"
+                    "12...51\n"
+                    "1111111\n")
+    report = solve_map(str(path))
+    assert report["solvable"] is True
+    assert report["moves"] == len(report["solution"].split())
+    unsolvable = os.path.join("maps", "student_map2.txt")
+    assert solve_map(unsolvable)["solvable"] is False
+    assert solve_map(unsolvable, max_states=1)["solvable"] is None
+
+    assert main(["--json", "--jobs", "1", str(path)]) == 0
+    assert main(["--json", "--jobs", "1", "--require-solvable", str(path),
+                 unsolvable]) == 1
+    assert main(["--json", "--jobs", "1", "--require-solvable",
+                 "--max-states", "1", unsolvable]) == 1
+    assert main(["--json", "--jobs", "1", "--require-solvable",
+                 "--allow-gave-up", "--max-states", "1", unsolvable]) == 0
+    captured = capsys.readouterr()
+    lines = captured.out.splitlines()
+    reports = [json.loads(line) for line in lines if line.startswith("{")]
+    assert [r["solvable"] for r in reports] == [True, True, False, None,
+                                                None]
+    assert "gave up" in captured.err
+    from solver import is_level
+    assert is_level(str(path)) and not is_level(unsolvable)
+
+
+def test_benchmark_map(tmp_path):
+    """
+    Check that the benchmarks time every operation on a synthetic map, and
+    that the player there pushes a whole row of walls
+    """
+    from benchmarks import benchmark_map, load_game, push_chain_length, \
+        synthetic_map
+    lines = synthetic_map(20, 12)
+    assert len(lines) == 12 and all(len(line) == 20 for line in lines)
+    path = tmp_path / "synthetic.txt"
+    path.write_text("\n".join(lines) + "\n")
+    results = benchmark_map(str(path), repeat=1)
+    assert results["size"] == [20, 12]
+    assert "Wall isPush" in results["rules"]
+    for operation in ["load", "move", "update", "update_all", "undo",
+                      "copy", "win_or_lose", "draw_full", "draw_move"]:
+        assert results[operation]["runs"] == 1
+    game = load_game(str(path))
+    game.step(1, 0)
+    walls = [ac for ac in game.get_actors() if isinstance(ac, Wall)]
+    assert sorted(ac.x for ac in walls if ac.y == 3) == \
+        list(range(4, 4 + push_chain_length(20)))
+
+
+def test_hash_recognises_repeated_states():
+    """
+    Check that the Zobrist hash is kept up to date by moves, rules and undo,
+    and is the same whenever the game comes back to the same state
+    """
+    game = setup_headless("student_map5.txt")
+    start = game.get_hash()
+    game.step(0, 1)
+    assert game.get_hash() != start
+    game.step(0, -1)
+    assert game.get_hash() == start
+    for dx, dy in [(1, 0), (1, 0), (0, 1), (0, 1), (-1, 0)]:
+        game.step(dx, dy)
+        assert game._hash == game._full_hash()
+    while not game._history.is_empty():
+        game._undo()
+        assert game._hash == game._full_hash()
+    assert game.get_hash() == start
+
+
+def test_hash_counts_stacked_actors(tmp_path):
+    """
+    Check that two actors of the same kind in the same cell do not cancel
+    out of the hash
+    """
+    hashes = []
+    for name, row in [("stacked.txt", "1.22...1"), ("empty.txt", "1......1")]:
+        path = tmp_path / name
+        path.write_text("11111111\n1MIY...1\n" + row + "\n11111111\n")
+        game = setup_headless_path(str(path))
+        game.step(-1, 0)
+        assert game._hash == game._full_hash()
+        hashes.append(game._hash)
+    assert hashes[0] != hashes[1]
+
+
+def test_replay_seeks_any_state():
+    """
+    Check that seeking a recorded game gives the state it was in after any
+    number of moves and undos, and that the log alone replays the same
+    """
+    import random
+    from replay import Replay, UNDO, FRAME
+
+    def state(game):
+        return (game.get_hash(), game.get_rules(), game.get_outcome(),
+                [(type(ac).__name__, ac.x, ac.y) for ac in game.get_actors()])
+
+    game = setup_headless("map.txt")
+    game.step(1, 0)
+    game.set_history_budget(max_entries=6, pack_after=2)
+    start = game._copy()
+    game.start_recording(every=7)
+    assert game._history.is_empty()
+    states = {0: state(game)}
+    actions = random.Random(0)
+    while len(game.replay) < 300:
+        if game.player is None or actions.random() < 0.3:
+            game._undo()
+        else:
+            game.step(*actions.choice(DIRECTIONS))
+        states[len(game.replay)] = state(game)
+    log = game.replay.get_log()
+    assert UNDO in log and FRAME in log
+    assert {i: state(game.seek(i)) for i in states} == states
+    replay = Replay.from_log(start, log, every=50)
+    assert replay.get_log() == log
+    assert {i: state(replay.seek(i)) for i in states} == states
+    with pytest.raises(IndexError):
+        game.seek(len(log) + 1)
+
+
+def test_replay_seeks_frames(tmp_path):
+    """
+    Check that seeking gives the right state when the game was recorded
+    frame by frame, with the rules updated once after the moves and undos
+    of each frame, as in a running game
+    """
+    import random
+    from replay import Replay
+
+    def state(game):
+        return (game.get_hash(), game.get_rules(),
+                [(type(ac).__name__, ac.x, ac.y) for ac in game.get_actors()])
+
+    path = tmp_path / "wall_push.txt"
+    path.write_text("1111111111\n12W.IP3..1\n1MIY1....1\n1.........\n"
+                    "1111111111\n")
+    for every in [1, 2, 3]:
+        game = setup_headless_path(str(path))
+        start = game._copy()
+        game.start_recording(every)
+        states = {0: state(game)}
+        actions = random.Random(every)
+        for i in range(40):
+            for _ in range(actions.randint(0, 2) if i >= 2 else 1):
+                if i < 2:
+                    game._play_move((1, 0))
+                elif game.player is None or actions.random() < 0.25:
+                    game._undo()
+                else:
+                    game._play_move(actions.choice(DIRECTIONS))
+                states[len(game.replay)] = state(game)
+            game._update()
+            states[len(game.replay)] = state(game)
+        assert {i: state(game.seek(i)) for i in states} == states
+        replay = Replay.from_log(start, game.replay.get_log(), every)
+        assert {i: state(replay.seek(i)) for i in states} == states
+
+    # Both moves of this frame happen before the rules are updated, so the
+    # second one is not blocked by "Wall isStop", which the first forms.
+    path = tmp_path / "one_frame.txt"
+    path.write_text("1111111\n1WI...1\n1.3S..1\n1..2..1\n1MIY..1\n"
+                    "1111111\n")
+    game = setup_headless_path(str(path))
+    start = game._copy()
+    game.start_recording()
+    game._play_move((0, -1))
+    game._play_move((-1, 0))
+    game._update()
+    assert (game.player.x, game.player.y) == (2, 2)
+    for copy in [game.seek(len(game.replay)),
+                 Replay.from_log(start, game.replay.get_log()).seek(3)]:
+        assert state(copy) == state(game)
+
+
+def test_save_and_restore(tmp_path, monkeypatch):
+    """
+    Check that a restored game is in the state the game was saved in, and
+    that with its undo history it undoes the same way, even after a loss
+    """
+    import random
+    import game as game_module
+
+    def state(game):
+        return (game.get_hash(), game.get_rules(), game.get_outcome(),
+                game.get_running(),
+                [(type(ac).__name__, ac.x, ac.y, ac.sprite)
+                 for ac in game.get_actors()])
+
+    def restored(path):
+        game = Game(headless=True)
+        game.set_history_budget(max_entries=20, pack_after=3)
+        game.restore(path)
+        return game
+
+    game = setup_headless("map.txt")
+    game.set_history_budget(max_entries=20, pack_after=3)
+    actions = random.Random(1)
+    for _ in range(150):
+        if game.player is None or actions.random() < 0.25:
+            game._undo()
+            game._update()
+        else:
+            game.step(*actions.choice(DIRECTIONS))
+    path = str(tmp_path / "game.sav")
+    game.save(path)
+    copy = restored(path)
+    assert state(copy) == state(game)
+    assert copy._hash == copy._full_hash()
+    assert copy.get_history() == []
+    game.save(path, history=True)
+    copy = restored(path)
+    assert state(copy) == state(game)
+    assert len(copy.get_history()) == len(game.get_history()) > 10
+    while game.get_history():
+        game._undo()
+        copy._undo()
+        assert state(copy) == state(game)
+
+    ends = tmp_path / "ends.txt"
+    ends.write_text("11111111\n"
+                    "1MIY...1\n"
+                    "1RIL...1\n"
+                    "1..4...1\n"
+                    "1.42...1\n"
+                    "11111111\n")
+    game = setup_headless_path(str(ends))
+    game.step(1, 0)
+    game.step(-1, 0)
+    game.step(-1, 0)
+    assert game.get_outcome() == "lose"
+    game.save(path, history=True)
+    copy = restored(path)
+    assert copy.player is None and state(copy) == state(game)
+    game._undo()
+    copy._undo()
+    assert copy.player is not None and state(copy) == state(game)
+
+    from solver import solve
+    solvable = tmp_path / "solvable.txt"
+    solvable.write_text("11111111\n"
+                        "1MIY...1\n"
+                        "1FIV...1\n"
+                        "12....51\n"
+                        "11111111\n")
+    game = setup_headless_path(str(solvable))
+    game.step(1, 0)
+    game.save(str(tmp_path / "solvable.sav"))
+    copy = restored(str(tmp_path / "solvable.sav"))
+    assert copy.map_data == ["11111111", "1MIY...1", "1FIV...1",
+                             "1.2...51", "11111111"]
+    moves = solve(copy)
+    assert moves is not None and len(moves) == 4
+    for dx, dy in moves:
+        copy.step(dx, dy)
+    assert copy.get_outcome() == "win"
+
+    monkeypatch.setattr(game_module, "AUTOSAVE_EVERY", 2)
+    game = setup_headless("map.txt")
+    game.save_path = str(tmp_path / "autosave.sav")
+    assert game.step(1, 0) and not os.path.exists(game.save_path)
+    assert game.step(1, 0)
+    assert state(restored(game.save_path)) == state(game)
+
+    # The player walks out through the gap in the border of this map.
+    game = setup_headless("student_map5.txt")
+    for (dx, dy), count in [((-1, 0), 4), ((0, 1), 8), ((-1, 0), 3)]:
+        for _ in range(count):
+            game.step(dx, dy)
+    assert (game.player.x, game.player.y) == (-2, 10)
+    game.save(path, history=True)
+    copy = restored(path)
+    assert state(copy) == state(game)
+    assert copy.map_data == [line.replace("2", ".")
+                             for line in game.map_data]
+    assert copy.step(1, 0) and game.step(1, 0)
+    copy._undo()
+    game._undo()
+    assert state(copy) == state(game)
+
+    with open(path, "rb") as f:
+        data = f.read()
+    from savegame import _HEADER
+    meta = _HEADER.size
+    for bad in [b"", b"not a saved game at all", data[:-3],
+                data[:meta] + b"(" + data[meta + 1:],
+                data.replace(b"'rules'", b"'rulez'")]:
+        with open(path, "wb") as f:
+            f.write(bad)
+        with pytest.raises(ValueError):
+            restored(path)
+    game = setup_headless("map.txt")
+    before = state(game)
+    with open(path, "wb") as f:
+        f.write(data.replace(b"'Meepo'", b"'Meeps'"))
+    with pytest.raises(ValueError):
+        game.restore(path)
+    assert state(game) == before and game.x_tiles == len(game.map_data[0])
+
+
 if __name__ == "__main__":
     import pytest
 
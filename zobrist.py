@@ -0,0 +1,29 @@
+from hashlib import blake2b
+from typing import Dict, Tuple
+
+# The random 64-bit number of every feature used so far, e.g.
+# ("Wall", 3, 4, 1) for the first Wall at (3, 4). Each number is derived from
+# the feature itself rather than drawn in order, so it is the same in every
+# run and every process, whatever order the table is filled in.
+_TABLE: Dict[Tuple, int] = {}
+
+
+def zobrist_key(*feature: object) -> int:
+    """Return the 64-bit Zobrist number of <feature>, a tuple of ints and
+    strings describing one part of a game state.
+
+    The hash of a state is the XOR of the numbers of its features, so it can
+    be updated by XOR-ing out the numbers of features that go away and XOR-ing
+    in the numbers of features that appear.
+
+    >>> zobrist_key("Wall", 3, 4, 1) == zobrist_key("Wall", 3, 4, 1)
+    True
+    >>> zobrist_key("Wall", 3, 4, 1) == zobrist_key("Wall", 4, 3, 1)
+    False
+    """
+    key = _TABLE.get(feature)
+    if key is None:
+        digest = blake2b(repr(feature).encode(), digest_size=8).digest()
+        key = int.from_bytes(digest, 'little')
+        _TABLE[feature] = key
+    return key